@@ -1,3 +1,4 @@
 from .sites import site
 from .decorators import register
-from .restmodeladmin import RestModelAdmin
\ No newline at end of file
+from .restmodeladmin import RestModelAdmin
+from .asyncadmin import AsyncRestModelAdmin
@@ -0,0 +1,223 @@
+import asyncio
+from functools import update_wrapper
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured, SynchronousOnlyOperation, ValidationError as DjangoValidationError
+from django.http import Http404
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.serializers import ModelSerializer
+from rest_framework.utils import model_meta
+
+from .restmodeladmin import RestModelAdmin
+
+
+class AsyncRestModelAdmin(RestModelAdmin):
+    """RestModelAdmin served by async handlers, for ASGI deployments
+
+    list, retrieve, create, update, partial_update and destroy run on Django's
+    async ORM (async iteration, aget, acreate, asave, adelete) so slow admin queries
+    don't hold a worker thread. Requires Django 4.2 or later.
+
+    Authentication, the filter backends, serializer validation and the paginators
+    of the site are synchronous and run through sync_to_async. Permissions whose `has_permission`
+    is a coroutine are awaited, the ones in `sync_safe_permissions` only read the
+    authenticated user and are called inline, any other runs through sync_to_async.
+    Extra actions (bulk, export, import...) stay synchronous. The response cache and
+    the ETag version token of `RestModelAdmin` are not applied to the async handlers.
+    """
+
+    sync_safe_permissions = (permissions.AllowAny, permissions.IsAuthenticated, permissions.IsAdminUser,
+                             permissions.IsAuthenticatedOrReadOnly)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        check_async_support()
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        check_async_support()
+        view = super().as_view(actions, **initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return update_wrapper(async_view, view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """Async counterpart of `APIView.initial`"""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        # Loading the user reads the session and user tables
+        await sync_to_async(self.perform_authentication)(request)
+        await self.acheck_permissions(request)
+        await sync_to_async(self.check_throttles)(request)
+
+    async def acheck_permissions(self, request):
+        for permission in self.get_permissions():
+            if not await self.call_permission(permission, permission.has_permission, request, self):
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None)
+                )
+
+    async def acheck_object_permissions(self, request, obj):
+        for permission in self.get_permissions():
+            if not await self.call_permission(permission, permission.has_object_permission, request, self, obj):
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None)
+                )
+
+    async def call_permission(self, permission, check, *args):
+        if asyncio.iscoroutinefunction(check):
+            return await check(*args)
+        if type(permission) in self.sync_safe_permissions:
+            return check(*args)
+        return await sync_to_async(check)(*args)
+
+    async def aget_object(self):
+        """Async counterpart of `GenericAPIView.get_object`"""
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+
+        try:
+            obj = await queryset.aget(**filter_kwargs)
+        except (queryset.model.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            raise Http404
+
+        await self.acheck_object_permissions(self.request, obj)
+        return obj
+
+    async def aserialize(self, serializer):
+        """The data of the serializer, in a thread if serializing touches the database"""
+        try:
+            return serializer.data
+        except SynchronousOnlyOperation:
+            return await sync_to_async(lambda: serializer.data)()
+
+    async def list(self, request, *args, **kwargs):
+        # Filter backends may query, the full text search checks its index table
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+
+        if self.paginator is not None:
+            page = await sync_to_async(self.paginate_queryset)(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(await self.aserialize(serializer))
+
+        instances = [instance async for instance in queryset]
+        serializer = self.get_serializer(instances, many=True)
+        return Response(await self.aserialize(serializer))
+
+    async def retrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance)
+        return Response(await self.aserialize(serializer))
+
+    async def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        await self.perform_acreate(serializer)
+        data = await self.aserialize(serializer)
+        headers = self.get_success_headers(data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+
+    async def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        await self.perform_aupdate(serializer)
+
+        if getattr(instance, '_prefetched_objects_cache', None):
+            # If 'prefetch_related' has been applied to a queryset, we need to
+            # forcibly invalidate the prefetch cache on the instance.
+            instance._prefetched_objects_cache = {}
+
+        return Response(await self.aserialize(serializer))
+
+    async def partial_update(self, request, *args, **kwargs):
+        kwargs['partial'] = True
+        return await self.update(request, *args, **kwargs)
+
+    async def destroy(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        await self.perform_adestroy(instance)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    async def perform_acreate(self, serializer):
+        if not self.can_write_async(serializer):
+            return await sync_to_async(serializer.save)()
+        model = serializer.Meta.model
+        serializer.instance = await model._default_manager.acreate(**serializer.validated_data)
+        return serializer.instance
+
+    async def perform_aupdate(self, serializer):
+        if not self.can_write_async(serializer):
+            return await sync_to_async(serializer.save)()
+        instance = serializer.instance
+        for attr, value in serializer.validated_data.items():
+            setattr(instance, attr, value)
+        await instance.asave()
+        return instance
+
+    async def perform_adestroy(self, instance):
+        if type(self).perform_destroy is not RestModelAdmin.perform_destroy:
+            return await sync_to_async(self.perform_destroy)(instance)
+        await instance.adelete()
+
+    def can_write_async(self, serializer):
+        """Only the plain ModelSerializer writes of model fields are done with the async ORM"""
+        if not isinstance(serializer, ModelSerializer):
+            return False
+        if type(serializer).create is not ModelSerializer.create or type(serializer).update is not ModelSerializer.update:
+            return False
+        if type(self).perform_create is not RestModelAdmin.perform_create:
+            return False
+        if type(self).perform_update is not RestModelAdmin.perform_update:
+            return False
+        relations = model_meta.get_field_info(serializer.Meta.model).relations
+        return not any(relations[name].to_many for name in serializer.validated_data if name in relations)
+
+
+def check_async_support():
+    """The async handlers use the async ORM methods (aget, acreate...) added in Django 4.2"""
+    if django.VERSION < (4, 2):
+        raise ImproperlyConfigured("AsyncRestModelAdmin requires Django 4.2 or later")
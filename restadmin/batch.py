@@ -0,0 +1,144 @@
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+# Headers of the batch request that don't apply to its sub-requests
+SKIPPED_HEADERS = ("CONTENT_LENGTH", "CONTENT_TYPE", "HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE",
+                   "HTTP_IF_MATCH", "HTTP_IF_UNMODIFIED_SINCE")
+
+
+class BatchView(APIView):
+    """
+    Answer a list of GET requests to the registered models in one round trip.
+
+    The body is `{"requests": [...], "parallel": false}`, each request a path relative to the urls
+    of the site, e.g. "tests/TestModel/?page=2", or `{"path": ..., "params": {...}}`. The requests
+    are dispatched in-process to the viewsets as the user of the batch, with their permissions,
+    filters and pagination, and answered as `{"responses": [{"status": 200, "body": ...}, ...]}`
+    in the same order. With `parallel` they run on up to `max_workers` threads.
+    """
+    site = None
+    permission_classes = [IsAdminUser]
+    # The docs list the endpoints of the models themselves
+    schema = None
+    max_requests = 20
+    max_workers = 4
+
+    def post(self, request, *args, **kwargs):
+        items, parallel = self.get_batch(request.data)
+        prefix = request.path[:-len("batch/")] if request.path.endswith("batch/") else "/"
+
+        if parallel and self.max_workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+                responses = list(executor.map(
+                    lambda item: self.dispatch_in_thread(request, prefix, *item), items))
+        else:
+            responses = [self.dispatch_item(request, prefix, *item) for item in items]
+        return Response({"responses": responses})
+
+    def get_batch(self, data):
+        """Validate the body, returns the (path, query string) of the requests and whether to run them in parallel"""
+        if not isinstance(data, dict) or not isinstance(data.get("requests"), list):
+            raise ValidationError({"requests": [_("Expected a list of requests.")]})
+        requests = data["requests"]
+        if len(requests) > self.max_requests:
+            raise ValidationError({"requests": [
+                _("Ensure this batch has no more than {limit} requests.").format(limit=self.max_requests)]})
+
+        items, errors = [], []
+        for item in requests:
+            try:
+                items.append(self.parse_item(item))
+                errors.append({})
+            except ValidationError as exc:
+                errors.append(exc.detail)
+        if any(errors):
+            raise ValidationError({"requests": errors})
+        return items, bool(data.get("parallel", False))
+
+    def parse_item(self, item):
+        if isinstance(item, str):
+            item = {"path": item}
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            raise ValidationError({"path": [_("Expected a path.")]})
+        if item.get("method", "GET").upper() != "GET":
+            raise ValidationError({"method": [_("Only GET requests can be batched.")]})
+
+        url = urlsplit(item["path"])
+        query = QueryDict(url.query, mutable=True)
+        params = item.get("params") or {}
+        if not isinstance(params, dict):
+            raise ValidationError({"params": [_("Expected a dictionary of query parameters.")]})
+        for name, value in params.items():
+            query.setlist(name, [str(v) for v in value] if isinstance(value, list) else [str(value)])
+        return url.path.lstrip("/"), query.urlencode()
+
+    def dispatch_in_thread(self, request, prefix, path, query_string):
+        try:
+            return self.dispatch_item(request, prefix, path, query_string)
+        finally:
+            # Every thread opened its own connections
+            connections.close_all()
+
+    def dispatch_item(self, request, prefix, path, query_string):
+        try:
+            match = self.site.get_resolver().resolve(path)
+        except Resolver404:
+            return {"status": status.HTTP_404_NOT_FOUND, "body": {"detail": NotFound.default_detail}}
+
+        sub_request = self.make_sub_request(request, prefix + path, query_string)
+        sub_request.resolver_match = match
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if inspect.isawaitable(response):
+            # The view of an AsyncRestModelAdmin
+            response = async_to_sync(_await)(response)
+        if response.streaming:
+            response.close()
+            return {"status": status.HTTP_400_BAD_REQUEST,
+                    "body": {"detail": _("Streaming responses can't be batched.")}}
+        return {"status": response.status_code, "body": self.get_body(response)}
+
+    def make_sub_request(self, request, path, query_string):
+        """A GET request to `path` with the headers and the authenticated user of the batch request"""
+        batch_request = request._request
+        sub_request = HttpRequest()
+        sub_request.method = "GET"
+        sub_request.path = sub_request.path_info = path
+        sub_request.META = {key: value for key, value in batch_request.META.items() if key not in SKIPPED_HEADERS}
+        sub_request.META.update({"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query_string,
+                                 "HTTP_ACCEPT": "application/json"})
+        sub_request.GET = QueryDict(query_string)
+        sub_request.COOKIES = batch_request.COOKIES
+        if hasattr(batch_request, "session"):
+            sub_request.session = batch_request.session
+        # The batch is authenticated once, the viewsets still check their permissions
+        sub_request.user = request.user
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+    def get_body(self, response):
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return None
+        if isinstance(response, Response):
+            return response.data
+        # e.g. a response served from the cache of CacheResponseMixin
+        if response.get("Content-Type", "").startswith("application/json"):
+            return json.loads(response.content)
+        return response.content.decode(response.charset)
+
+
+async def _await(awaitable):
+    return await awaitable
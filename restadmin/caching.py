@@ -0,0 +1,273 @@
+import hashlib
+from calendar import timegm
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, DateTimeField, Max
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+
+from .pagination import EstimatedCountPagination
+
+CACHED_HEADERS = ("Allow", "ETag", "Last-Modified", "Vary")
+
+
+class CacheResponseMixin:
+    """
+    Cache the rendered list and retrieve responses of the model for `cache_timeout` seconds.
+
+    Entries are keyed by the model, the url with its query parameters, the negotiated format
+    and the scope of the user (`get_cache_scope`). Every write bumps a per-model generation
+    counter that is part of the key, which drops all the entries of the model at once.
+    Permissions are still checked on every request. When a permission class checks objects,
+    retrieve fetches the object before serving it from the cache, only its serialization is saved.
+    """
+    cache_timeout = None
+    cache_alias = "default"
+
+    def list(self, request, *args, **kwargs):
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            if self.has_object_permissions():
+                # Raises a 404 or a 403 like the retrieve would
+                self.get_object()
+            return cached
+        return super().retrieve(request, *args, **kwargs)
+
+    def has_object_permissions(self):
+        """Whether a permission class of the view implements `has_object_permission`"""
+        return any(type(permission).has_object_permission is not BasePermission.has_object_permission
+                   for permission in self.get_permissions())
+
+    def get_cache_scope(self, request):
+        """Responses are only shared between requests with the same scope, the user by default"""
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            return "anonymous"
+        return f"user:{user.pk}"
+
+    def get_cache_key(self, request):
+        model = self.get_queryset().model
+        generation = get_cache_generation(model, self.cache_alias)
+        key = ":".join((request.get_full_path(), request.accepted_media_type or "", self.get_cache_scope(request)))
+        return f"restadmin:{model._meta.label_lower}:{generation}:{hashlib.md5(key.encode()).hexdigest()}"
+
+    def get_cached_response(self, request):
+        self._cache_key = None
+        if self.cache_timeout is None or request.method not in ("GET", "HEAD"):
+            return None
+        self._cache_key = self.get_cache_key(request)
+        cached = caches[self.cache_alias].get(self._cache_key)
+        if cached is None:
+            return None
+
+        response = HttpResponse(cached["content"], content_type=cached["content_type"])
+        for header, value in cached["headers"].items():
+            response[header] = value
+        if "ETag" in response or "Last-Modified" in response:
+            last_modified = response.get("Last-Modified")
+            return get_conditional_response(
+                request, etag=response.get("ETag"),
+                last_modified=last_modified and parse_http_date_safe(last_modified), response=response)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "_cache_key", None) and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            caches[self.cache_alias].set(self._cache_key, {
+                "content": response.content,
+                "content_type": response["Content-Type"],
+                "headers": {header: response[header] for header in CACHED_HEADERS if header in response},
+            }, self.cache_timeout)
+        return response
+
+    def perform_bulk_destroy(self, instances):
+        deleted = super().perform_bulk_destroy(instances)
+        self.invalidate_cache()
+        return deleted
+
+    def perform_bulk_update(self, serializers):
+        instances = super().perform_bulk_update(serializers)
+        self.invalidate_cache()
+        return instances
+
+    def bulk_create_objects(self, validated_data):
+        instances = super().bulk_create_objects(validated_data)
+        self.invalidate_cache()
+        return instances
+
+    def invalidate_cache(self):
+        """Drop the cached responses of the model, the model signals do it for single object writes"""
+        if self.cache_timeout is not None:
+            invalidate_cache(self.get_queryset().model, self.cache_alias)
+
+
+def get_cache_generation(model, cache_alias="default"):
+    return caches[cache_alias].get_or_set(_generation_key(model), 1, None)
+
+
+def invalidate_cache(model, cache_alias="default"):
+    """Bump the generation of the model now and again once the transaction commits"""
+    def bump():
+        cache = caches[cache_alias]
+        try:
+            cache.incr(_generation_key(model))
+        except ValueError:
+            cache.set(_generation_key(model), 1, None)
+
+    bump()
+    # A read between the write and the commit could have cached the old rows
+    transaction.on_commit(bump)
+
+
+def connect_cache_invalidation(model, cache_alias="default", owner=None):
+    """
+    Invalidate the cached responses of the model whenever one of its objects is saved or deleted.
+
+    Each owner, e.g. an admin site, connects the receiver of the model and cache alias once and
+    it stays connected until its last owner disconnects it.
+    """
+    def receiver(sender, **kwargs):
+        invalidate_cache(model, cache_alias)
+
+    uid = _receiver_uid(model, cache_alias)
+    _invalidation_owners[uid].add(owner)
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(receiver, sender=field.remote_field.through, weak=False, dispatch_uid=uid)
+
+
+def disconnect_cache_invalidation(model, cache_alias="default", owner=None):
+    uid = _receiver_uid(model, cache_alias)
+    owners = _invalidation_owners[uid]
+    owners.discard(owner)
+    if owners:
+        return
+    del _invalidation_owners[uid]
+    post_save.disconnect(sender=model, dispatch_uid=uid)
+    post_delete.disconnect(sender=model, dispatch_uid=uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.disconnect(sender=field.remote_field.through, dispatch_uid=uid)
+
+
+# The owners of each connected invalidation receiver, by dispatch uid
+_invalidation_owners = defaultdict(set)
+
+
+def _receiver_uid(model, cache_alias):
+    return f"{_generation_key(model)}:{cache_alias}"
+
+
+def _generation_key(model):
+    return f"restadmin:{model._meta.label_lower}:generation"
+
+
+class ConditionalGetMixin:
+    """
+    ETag headers on list and retrieve, and Last-Modified on retrieve, with 304 answers to conditional requests.
+
+    When the model has a timestamp field (`timestamp_field`, or the first `auto_now` DateTimeField)
+    a version token is read before anything else: `COUNT`/`MAX(timestamp)` of the filtered
+    queryset for list, the timestamp of the single row for retrieve. A matching `If-None-Match`
+    or `If-Modified-Since` is answered with a 304 without fetching or serializing the rows.
+    Without a timestamp field the ETag is a hash of the rendered body, as it is for the lists
+    of keyset and estimated count pagination, which are there to avoid scanning the table.
+
+    Writes that skip `auto_now`, like `QuerySet.update()`, aren't seen by the version token.
+    """
+    conditional_get = True
+    timestamp_field = None
+
+    def list(self, request, *args, **kwargs):
+        version = self.get_list_version(request) if self.conditional_get else None
+        return self.conditional_response(version, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        version = self.get_object_version(request) if self.conditional_get else None
+        return self.conditional_response(version, super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, version, handler, request, *args, **kwargs):
+        if version is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = version
+        headers = HttpResponse()
+        headers["ETag"] = etag
+        if last_modified is not None:
+            headers["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified and timegm(last_modified.utctimetuple()),
+            response=headers)
+        if not_modified is not headers:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        for header in ("ETag", "Last-Modified"):
+            if header in headers:
+                response[header] = headers[header]
+        return response
+
+    def get_timestamp_field(self):
+        """The name of the field updated on every save, None if the model has none"""
+        if self.timestamp_field:
+            return self.timestamp_field
+        for field in self.get_queryset().model._meta.concrete_fields:
+            if isinstance(field, DateTimeField) and field.auto_now:
+                return field.name
+        return None
+
+    def get_list_version(self, request):
+        """
+        Return the etag of the list from a single aggregate query, and no last modified date:
+        deleting a row doesn't change the latest timestamp, only the count in the etag.
+        """
+        timestamp_field = self.get_timestamp_field()
+        if timestamp_field is None or isinstance(self.paginator, (CursorPagination, EstimatedCountPagination)):
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        version = queryset.aggregate(count=Count("pk"), last_modified=Max(timestamp_field))
+        return self.make_etag(request, version["count"], version["last_modified"]), None
+
+    def get_object_version(self, request):
+        """Return (etag, last modified) of the object from its timestamp column only"""
+        timestamp_field = self.get_timestamp_field()
+        if timestamp_field is None:
+            return None
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        row = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).values_list(
+            "pk", timestamp_field).first()
+        if row is None:
+            # Let retrieve answer with its 404
+            return None
+        return self.make_etag(request, *row), row[1]
+
+    def make_etag(self, request, *version):
+        # The representation depends on the url (filters, page) and on the negotiated format
+        key = ":".join(str(part) for part in (request.get_full_path(), request.accepted_media_type) + version)
+        return "W/" + quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (self.conditional_get and request.method in ("GET", "HEAD") and self.action in ("list", "retrieve")
+                and isinstance(response, Response) and response.status_code == 200
+                and not response.has_header("ETag")):
+            # No version token, fall back to a hash of the rendered body
+            response.render()
+            set_response_etag(response)
+            return get_conditional_response(request, etag=response["ETag"], response=response)
+        return response
@@ -0,0 +1,172 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+
+
+class ChangeFeedMixin:
+    """
+    The `changes` endpoint: what was created, updated or deleted since a sequence number.
+
+    With `track_changes` every write to the model is recorded in the ChangeLogEntry table, from
+    the model signals for single object writes and from the bulk and import endpoints, which
+    skip the signals. `?since=` is the `next` sequence number of the previous answer, 0 or
+    nothing for the whole log. Each object appears once with its current data, objects deleted
+    or out of the queryset of the viewset as a tombstone without data.
+
+    Entries are added when the write commits and only served once they are `changes_settle_delay`
+    seconds old. A transaction committing just after another could have taken the lower sequence
+    number, the delay lets it land before a client moves `since` past it.
+
+    `QuerySet.update()` and other writes that skip the signals outside of the viewset aren't recorded.
+    """
+    track_changes = False
+    changes_page_size = 1000
+    changes_settle_delay = 1
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request, *args, **kwargs):
+        from .models import ChangeLogEntry
+
+        if not self.track_changes:
+            raise NotFound()
+        since = self.get_changes_param(request, "since", 0)
+        limit = min(self.get_changes_param(request, "limit", self.changes_page_size), self.changes_page_size)
+        queryset = self.get_queryset()
+        model = queryset.model
+
+        # Read the log from the database the data is read from, so they agree
+        log = ChangeLogEntry.objects.db_manager(queryset.db).filter(model=model._meta.label_lower, pk__gt=since)
+        if self.changes_settle_delay:
+            log = log.filter(timestamp__lte=timezone.now() - timedelta(seconds=self.changes_settle_delay))
+        entries = list(log.order_by("pk").values_list("pk", "object_id", "action")[:limit])
+        # Only the latest change of each object matters, the data is read as it is now
+        latest = {}
+        for sequence, object_id, change in entries:
+            latest.pop(object_id, None)
+            latest[object_id] = (sequence, change)
+
+        alive = [object_id for object_id, (_sequence, change) in latest.items() if change != ChangeLogEntry.DELETED]
+        data = {}
+        if alive:
+            instances = list(queryset.filter(pk__in=alive))
+            for instance, item in zip(instances, self.get_serializer(instances, many=True).data):
+                data[str(instance.pk)] = item
+
+        changes = []
+        for object_id, (sequence, change) in latest.items():
+            item = {"seq": sequence, "action": change, "id": model._meta.pk.to_python(object_id)}
+            if object_id in data:
+                item["data"] = data[object_id]
+            else:
+                item["action"] = ChangeLogEntry.DELETED
+            changes.append(item)
+        return Response({
+            "next": entries[-1][0] if entries else since,
+            "more": len(entries) == limit,
+            "changes": changes,
+        })
+
+    def get_changes_param(self, request, name, default):
+        value = request.query_params.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            value = -1
+        if value < 0 or (name == "limit" and value == 0):
+            raise ValidationError({name: [_("A valid integer is required.")]})
+        return value
+
+    def bulk_create_objects(self, validated_data):
+        instances = super().bulk_create_objects(validated_data)
+        if self.track_changes:
+            from .models import ChangeLogEntry
+            record_changes(self.get_queryset().model, ChangeLogEntry.CREATED, [instance.pk for instance in instances])
+        return instances
+
+    def perform_bulk_update(self, serializers):
+        instances = super().perform_bulk_update(serializers)
+        if self.track_changes:
+            from .models import ChangeLogEntry
+            record_changes(self.get_queryset().model, ChangeLogEntry.UPDATED, [instance.pk for instance in instances])
+        return instances
+
+
+def record_changes(model, change, pks, using=None):
+    """Add a ChangeLogEntry per primary key once the transaction of the write on `using` commits, in one query"""
+    from .models import ChangeLogEntry
+
+    label = model._meta.label_lower
+    object_ids = [str(pk) for pk in pks if pk is not None]
+
+    def record():
+        # Sequence numbers and timestamps are taken at commit, in the order the changes become visible
+        ChangeLogEntry.objects.bulk_create([
+            ChangeLogEntry(model=label, object_id=object_id, action=change) for object_id in object_ids])
+
+    if object_ids:
+        transaction.on_commit(record, using=using or router.db_for_write(model))
+
+
+def connect_change_tracking(model, owner=None):
+    """
+    Record the saves and deletes of the objects of the model, and the changes of their many to many fields.
+
+    The receivers are connected once per model, whatever the number of owners (e.g. admin sites)
+    tracking it, and stay connected until the last owner disconnects them.
+    """
+    from .models import ChangeLogEntry
+
+    _tracking_owners[model].add(owner)
+
+    def saved(sender, instance, created, raw=False, using=None, **kwargs):
+        if not raw:
+            record_changes(model, ChangeLogEntry.CREATED if created else ChangeLogEntry.UPDATED, [instance.pk], using)
+
+    def deleted(sender, instance, using=None, **kwargs):
+        record_changes(model, ChangeLogEntry.DELETED, [instance.pk], using)
+
+    def relations_changed(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        if reverse:
+            # The objects of the model are on the other side of the relation
+            if pk_set:
+                record_changes(model, ChangeLogEntry.UPDATED, pk_set, using)
+        elif isinstance(instance, model):
+            record_changes(model, ChangeLogEntry.UPDATED, [instance.pk], using)
+
+    uid = _tracking_uid(model)
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(relations_changed, sender=field.remote_field.through, weak=False, dispatch_uid=uid)
+
+
+def disconnect_change_tracking(model, owner=None):
+    owners = _tracking_owners[model]
+    owners.discard(owner)
+    if owners:
+        return
+    del _tracking_owners[model]
+    uid = _tracking_uid(model)
+    post_save.disconnect(sender=model, dispatch_uid=uid)
+    post_delete.disconnect(sender=model, dispatch_uid=uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.disconnect(sender=field.remote_field.through, dispatch_uid=uid)
+
+
+# The owners of the change tracking of each model
+_tracking_owners = defaultdict(set)
+
+
+def _tracking_uid(model):
+    return f"restadmin:{model._meta.label_lower}:changes"
@@ -0,0 +1,173 @@
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+
+from .queryset import get_indexed_fields
+
+LOOKUPS = ("exact", "in", "gt", "gte", "lt", "lte", "isnull")
+# Query parameters of the aggregate and changes actions
+ACTION_PARAMS = ("group_by", "aggregate", "since", "limit")
+PAGINATION_PARAMS = ("page_query_param", "page_size_query_param", "cursor_query_param", "limit_query_param",
+                     "offset_query_param")
+
+
+class FieldFilter(BaseFilterBackend):
+    """
+    Filter the queryset with `?field=value` and `?field__lookup=value` query parameters.
+
+    The filterable fields are the `filter_fields` of the view, a list of field names or a dict of
+    field name to lookups, and default to the fields backed by a database index. Lookups are
+    limited to LOOKUPS, `in` takes comma separated values and `isnull` true or false. Parameters
+    naming a field of the model that isn't filterable, or an unknown lookup, are rejected.
+
+    The parameters of the paginator, the format, the other filter backends and the restadmin
+    actions are never filters, fields with these names are filtered with `?page__exact=`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        model = queryset.model
+        filter_fields = get_filter_fields(view, model)
+        reserved = self.get_reserved_params(view)
+        filters = {}
+        for param, value in request.query_params.items():
+            if param in reserved:
+                continue
+            name, _separator, lookup = param.partition("__")
+            lookup = lookup or "exact"
+            if name not in filter_fields:
+                if _is_model_field(model, name):
+                    raise ValidationError({param: [_("Filtering on {field} is not allowed.").format(field=name)]})
+                # Pagination, format and the like
+                continue
+            if lookup not in filter_fields[name]:
+                raise ValidationError({param: [_("Unsupported lookup {lookup}.").format(lookup=lookup)]})
+            filters[f"{name}__{lookup}"] = self.clean_value(model._meta.get_field(name), lookup, value, param)
+        if filters:
+            queryset = queryset.filter(**filters)
+        return queryset
+
+    def get_reserved_params(self, view):
+        paginator = getattr(view, "paginator", None)
+        params = {getattr(paginator, name, None) for name in PAGINATION_PARAMS}
+        for backend in getattr(view, "filter_backends", ()):
+            params.update((getattr(backend, "ordering_param", None), getattr(backend, "search_param", None)))
+        params.update((api_settings.URL_FORMAT_OVERRIDE, getattr(view, "fields_query_param", None),
+                       getattr(view, "exclude_query_param", None)))
+        params.update(ACTION_PARAMS)
+        params.discard(None)
+        return params
+
+    def clean_value(self, model_field, lookup, value, param):
+        if lookup == "isnull":
+            if value.lower() not in ("true", "false", "1", "0"):
+                raise ValidationError({param: [_("Must be true or false.")]})
+            return value.lower() in ("true", "1")
+
+        target_field = model_field.target_field if model_field.is_relation else model_field
+        try:
+            if lookup == "in":
+                return [target_field.to_python(item) for item in value.split(",") if item]
+            return target_field.to_python(value)
+        except DjangoValidationError as error:
+            raise ValidationError({param: error.messages})
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter on the `ordering_fields` of the view, the fields backed by a database index by default.
+
+    Unknown fields are rejected. With keyset pagination the ordering of the paginator is the
+    default and non unique fields get the primary key as a tie breaker, so cursors stay stable.
+    """
+
+    def get_valid_fields(self, queryset, view, context=None):
+        return [(name, name) for name in get_ordering_fields(view, queryset.model)]
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if not params:
+            ordering = self.get_default_ordering(view)
+            if ordering is None and isinstance(getattr(view, "paginator", None), CursorPagination):
+                ordering = view.paginator.ordering
+            return ordering
+
+        fields = [param.strip() for param in params.split(",") if param.strip()]
+        valid_fields = get_ordering_fields(view, queryset.model)
+        invalid = [field for field in fields if field.lstrip("-") not in valid_fields]
+        if invalid:
+            raise ValidationError({self.ordering_param: [
+                _("Ordering on {fields} is not allowed.").format(fields=", ".join(invalid))]})
+
+        if isinstance(getattr(view, "paginator", None), CursorPagination):
+            fields = self.add_tie_breaker(queryset.model, fields)
+        return fields
+
+    def add_tie_breaker(self, model, fields):
+        pk_name = model._meta.pk.name
+        for field in fields:
+            model_field = model._meta.get_field(field.lstrip("-"))
+            if model_field.primary_key or model_field.unique:
+                return fields
+        descending = fields[-1].startswith("-")
+        return fields + [f"-{pk_name}" if descending else pk_name]
+
+
+def get_filter_fields(view, model):
+    """The filterable fields of the view as a dict of field name to allowed lookups"""
+    filter_fields = getattr(view, "filter_fields", None)
+    if filter_fields is None:
+        filter_fields = get_indexed_fields(model)
+    if isinstance(filter_fields, dict):
+        return filter_fields
+    return {name: LOOKUPS for name in filter_fields}
+
+
+def get_ordering_fields(view, model):
+    ordering_fields = getattr(view, "ordering_fields", None)
+    if ordering_fields is None:
+        return get_indexed_fields(model)
+    return ordering_fields
+
+
+def get_group_by_fields(view, model):
+    group_by_fields = getattr(view, "group_by_fields", None)
+    if group_by_fields is None:
+        return get_indexed_fields(model)
+    return group_by_fields
+
+
+def get_aggregate_fields(view, model):
+    """The fields the aggregate action computes over, the number and date columns by default"""
+    aggregate_fields = getattr(view, "aggregate_fields", None)
+    if aggregate_fields is None:
+        return [field.name for field in model._meta.concrete_fields
+                if not field.primary_key and not field.is_relation and isinstance(
+                    field, (models.IntegerField, models.FloatField, models.DecimalField, models.DateField))]
+    return aggregate_fields
+
+
+def check_filter_options(model, filter_fields=None, ordering_fields=None, group_by_fields=None,
+                         aggregate_fields=None):
+    """Raise ImproperlyConfigured for fields and lookups the model doesn't have"""
+    for option, names in (("filter_fields", filter_fields), ("ordering_fields", ordering_fields),
+                          ("group_by_fields", group_by_fields), ("aggregate_fields", aggregate_fields)):
+        unknown = [name for name in names or () if not _is_model_field(model, name)]
+        if unknown:
+            raise ImproperlyConfigured(f"Unknown {option} on {model.__name__}: {', '.join(unknown)}")
+    if isinstance(filter_fields, dict):
+        for name, lookups in filter_fields.items():
+            unsupported = [lookup for lookup in lookups if lookup not in LOOKUPS]
+            if unsupported:
+                raise ImproperlyConfigured(
+                    f"Unsupported lookups for {model.__name__}.{name}: {', '.join(unsupported)}")
+
+
+def _is_model_field(model, name):
+    try:
+        return model._meta.get_field(name).concrete
+    except FieldDoesNotExist:
+        return False
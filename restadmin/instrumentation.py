@@ -0,0 +1,288 @@
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer, Serializer
+
+from .queryset import get_related_lookups
+
+logger = logging.getLogger("restadmin")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Queries and timings of a single request, counts the queries as a database execute wrapper"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "db_time": self.db_time,
+            "serialize_time": self.serialize_time,
+            "render_time": self.render_time,
+            "total_time": self.total_time,
+        }
+
+
+class InstrumentationMixin:
+    """
+    Record the SQL queries, database time, serialization time and render time of every request.
+
+    The timings are sent in a `Server-Timing` header (`server_timing`) and passed to each of the
+    `metrics_hooks`, callables taking the request and a dict of the metrics, to feed statsd,
+    Prometheus and the like. Serialization time is the time spent in the handler outside the
+    database.
+
+    When a request runs more than `query_budget` queries it is logged on the "restadmin" logger,
+    or raises QueryBudgetExceeded when `query_budget_action` (or the RESTADMIN_QUERY_BUDGET_ACTION
+    setting) is "raise", to fail the tests that hit an N+1 regression.
+
+    Queries run while a streaming response is consumed, and the async handlers of
+    AsyncRestModelAdmin, are not counted.
+    """
+    server_timing = True
+    metrics_hooks = ()
+    query_budget = None
+    query_budget_action = None
+
+    def dispatch(self, request, *args, **kwargs):
+        self.request_metrics = RequestMetrics()
+        self._handler_started = None
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.request_metrics))
+            response = super().dispatch(request, *args, **kwargs)
+        self.request_metrics.total_time = time.perf_counter() - start
+
+        self.check_query_budget(request)
+        self.send_metrics(request, response)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._handler_started = time.perf_counter()
+        self._handler_db_time = self.request_metrics.db_time
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        metrics = getattr(self, "request_metrics", None)
+        if metrics is None:
+            return super().finalize_response(request, response, *args, **kwargs)
+
+        if self._handler_started is not None:
+            handler_time = time.perf_counter() - self._handler_started
+            metrics.serialize_time = max(0.0, handler_time - (metrics.db_time - self._handler_db_time))
+
+        start = time.perf_counter()
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response) and not response.is_rendered:
+            response.render()
+        metrics.render_time = time.perf_counter() - start
+
+        if self.server_timing:
+            response["Server-Timing"] = self.get_server_timing(metrics)
+        return response
+
+    def get_server_timing(self, metrics):
+        return ", ".join((
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+            f"serialize;dur={metrics.serialize_time * 1000:.2f}",
+            f"render;dur={metrics.render_time * 1000:.2f}",
+        ))
+
+    def get_query_budget_action(self):
+        return self.query_budget_action or getattr(settings, "RESTADMIN_QUERY_BUDGET_ACTION", "log")
+
+    def check_query_budget(self, request):
+        if self.query_budget is None or self.request_metrics.queries <= self.query_budget:
+            return
+        message = (f"{request.method} {request.get_full_path()} ran {self.request_metrics.queries} queries, "
+                   f"over the budget of {self.query_budget} of {type(self).__name__}")
+        if self.get_query_budget_action() == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def send_metrics(self, request, response):
+        if not self.metrics_hooks:
+            return
+        metrics = self.request_metrics.as_dict()
+        metrics.update({
+            "viewset": type(self).__name__,
+            "action": getattr(self, "action", None),
+            "method": request.method,
+            "status": response.status_code,
+        })
+        for hook in self.metrics_hooks:
+            try:
+                hook(request, metrics)
+            except Exception:
+                # A broken metrics backend must not fail the request
+                logger.exception("restadmin metrics hook %r failed", hook)
+
+
+class NPlusOneDetected(Exception):
+    pass
+
+
+class NPlusOneDetector:
+    """
+    Attribute the queries run while serializing to the serializer field being serialized, as a
+    database execute wrapper. A statement repeated `threshold` times or more for the same field
+    is an N+1.
+    """
+
+    def __init__(self, threshold=2):
+        self.threshold = threshold
+        self.fields = {}
+        self.active = []
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            key = (self.active[-1], normalize_sql(sql))
+            self.queries[key] = self.queries.get(key, 0) + 1
+        return execute(sql, params, many, context)
+
+    def watch(self, serializer, path=()):
+        """Track the fields of the serializer, and of the serializers nested in it"""
+        for name, field in serializer.fields.items():
+            field_path = path + (name,)
+            if not path:
+                self.fields[name] = field
+            for method in ("get_attribute", "to_representation"):
+                self._wrap(field, method, field_path)
+            nested = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(nested, Serializer):
+                self.watch(nested, field_path)
+
+    def _wrap(self, field, method_name, path):
+        method = getattr(field, method_name)
+
+        def wrapper(*args, **kwargs):
+            self.active.append(path)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.active.pop()
+
+        setattr(field, method_name, wrapper)
+
+    def get_findings(self, queryset):
+        """The repeated statements, with the lookups missing from `queryset` that would avoid them"""
+        findings = []
+        for (path, sql), count in self.queries.items():
+            if count < self.threshold:
+                continue
+            select_related, prefetch_related = get_related_lookups(queryset.model, {path[0]: self.fields[path[0]]})
+            planned_select = queryset.query.select_related
+            findings.append({
+                "field": ".".join(path),
+                "queries": count,
+                "sql": sql,
+                "suggestion": [
+                    f'select_related("{lookup}")' for lookup in select_related
+                    if planned_select is not True and not _in_select_related(planned_select, lookup)
+                ] + [
+                    f'prefetch_related("{lookup}")' for lookup in prefetch_related
+                    if lookup not in _prefetch_lookups(queryset)
+                ],
+            })
+        return sorted(findings, key=lambda finding: -finding["queries"])
+
+
+def normalize_sql(sql):
+    """Collapse the placeholder lists of IN clauses so statements only differing by them match"""
+    return re.sub(r"%s(?:, %s)+", "%s", sql)
+
+
+def _in_select_related(select_related, lookup):
+    for name in lookup.split("__"):
+        if not isinstance(select_related, dict) or name not in select_related:
+            return False
+        select_related = select_related[name]
+    return True
+
+
+def _prefetch_lookups(queryset):
+    return [getattr(lookup, "prefetch_to", lookup) for lookup in queryset._prefetch_related_lookups]
+
+
+class NPlusOneDetectionMixin:
+    """
+    Detect N+1 queries while list and retrieve responses are serialized.
+
+    `detect_nplusone` (the RESTADMIN_DETECT_NPLUSONE setting by default, itself defaulting to DEBUG)
+    is "log" (or True) to log every field whose serialization repeats a query on the "restadmin"
+    logger with the select_related/prefetch_related lookups to add, "raise" to raise
+    NPlusOneDetected, "record" to only keep them on `nplusone_findings`.
+    """
+    detect_nplusone = None
+    nplusone_threshold = 2
+
+    def get_detect_nplusone(self):
+        if self.detect_nplusone is not None:
+            return self.detect_nplusone
+        return getattr(settings, "RESTADMIN_DETECT_NPLUSONE", settings.DEBUG)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.nplusone_detector = None
+        self.nplusone_findings = []
+        mode = self.get_detect_nplusone()
+        if not mode or request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+
+        self.nplusone_detector = NPlusOneDetector(self.nplusone_threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.nplusone_detector))
+            response = super().dispatch(request, *args, **kwargs)
+
+        if self.nplusone_detector.queries:
+            self.nplusone_findings = self.nplusone_detector.get_findings(self.get_queryset())
+            self.report_nplusone(request, mode)
+        return response
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        detector = getattr(self, "nplusone_detector", None)
+        if detector is not None and self.action in ("list", "retrieve"):
+            target = getattr(serializer, "child", serializer)
+            if isinstance(target, Serializer):
+                detector.watch(target)
+        return serializer
+
+    def report_nplusone(self, request, mode):
+        messages = [
+            f"{request.method} {request.get_full_path()} ran {finding['queries']} similar queries serializing "
+            f"the field {finding['field']} of {type(self).__name__}: {finding['sql']}"
+            + (f". Add {', '.join(finding['suggestion'])} to the queryset" if finding["suggestion"] else "")
+            for finding in self.nplusone_findings
+        ]
+        if not messages or mode == "record":
+            return
+        if mode == "raise":
+            raise NPlusOneDetected("\n".join(messages))
+        for message in messages:
+            logger.warning(message)
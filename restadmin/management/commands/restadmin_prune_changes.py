@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from restadmin.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = "Delete the change log entries older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Days of changes to keep, 30 by default.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _by_model = ChangeLogEntry.objects.filter(timestamp__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {deleted} change log entries")
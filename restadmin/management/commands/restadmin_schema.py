@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Pre-render the coreapi and OpenAPI schemas of the admin site into the schema cache directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cache-dir", help="Directory to write the schemas to, RESTADMIN_SCHEMA_CACHE_DIR by default.")
+        parser.add_argument("--site", default="restadmin.site", help="Dotted path of the AdminSite, restadmin.site by default.")
+
+    def handle(self, *args, **options):
+        if getattr(settings, "ROOT_URLCONF", None):
+            # Registrations are usually made by the modules the urls import
+            get_resolver().url_patterns
+        site = import_string(options["site"])
+        schema_cache = site.schema_cache
+        cache_dir = schema_cache.cache_dir
+        if options["cache_dir"]:
+            schema_cache.cache_dir = options["cache_dir"]
+        try:
+            if not schema_cache.get_cache_dir():
+                raise CommandError("Pass --cache-dir or set RESTADMIN_SCHEMA_CACHE_DIR")
+            fingerprint = schema_cache.prerender()
+            for kind in schema_cache.kinds:
+                self.stdout.write(schema_cache.get_path(kind, fingerprint))
+        finally:
+            schema_cache.cache_dir = cache_dir
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+from restadmin.search import check_search_fields, clear_index_cache, get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Create the full text search indexes of the models registered with full_text_search."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--site", default="restadmin.site", help="Dotted path of the AdminSite, restadmin.site by default.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Database to create the indexes on.")
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Drop and create the existing indexes again, e.g. after search_fields changed.")
+        parser.add_argument("--drop", action="store_true", help="Drop the indexes instead of creating them.")
+
+    def handle(self, *args, **options):
+        if getattr(settings, "ROOT_URLCONF", None):
+            # Registrations are usually made by the modules the urls import
+            get_resolver().url_patterns
+        site = import_string(options["site"])
+        backend = get_search_backend(options["database"])
+        if backend is None:
+            raise CommandError(f"Full text search is not supported on the {options['database']} database")
+
+        try:
+            for model, viewset in site.get_registry().items():
+                if not getattr(viewset, "full_text_search", False):
+                    continue
+                try:
+                    check_search_fields(model, viewset.search_fields)
+                except ImproperlyConfigured as error:
+                    raise CommandError(str(error))
+
+                name = backend.get_index_name(model)
+                exists = backend.check_index(model)
+                if exists and (options["drop"] or options["rebuild"]):
+                    backend.drop_index(model)
+                    self.stdout.write(f"Dropped {name}")
+                    exists = False
+                if not exists and not options["drop"]:
+                    backend.create_index(model, viewset.search_fields)
+                    self.stdout.write(f"Created {name}")
+        finally:
+            clear_index_cache()
@@ -0,0 +1,561 @@
+import csv
+import itertools
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.db import DatabaseError, models, transaction
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.serializers import CharField
+
+from .filters import get_aggregate_fields, get_group_by_fields
+from .queryset import narrow_queryset
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import AutoModelSerializer, get_values_representation
+
+
+class SparseFieldsMixin:
+    """
+    Let read requests pick the fields they get with `?fields=a,b` or `?exclude=c,d`.
+
+    The selection applies to the serializer and to the queryset, which only loads the
+    columns and follows the relations the selected fields need.
+
+    `list_fields` are the fields the list action returns when the request doesn't pick its own,
+    all of them when None. "auto" leaves out the fields backed by `heavy_field_types` columns.
+    """
+    fields_query_param = "fields"
+    exclude_query_param = "exclude"
+    list_fields = None
+    heavy_field_types = (models.BinaryField, models.JSONField, models.TextField)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_selected_fields()
+        if fields is None:
+            return queryset
+        return narrow_queryset(queryset, fields)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_selected_fields()
+        if fields is not None:
+            target = getattr(serializer, "child", serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+    def get_selected_fields(self):
+        """The bound serializer fields asked for, None when the request doesn't narrow them"""
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        if not hasattr(self, "_selected_fields"):
+            self._selected_fields = self.select_fields(request)
+        return self._selected_fields
+
+    def select_fields(self, request):
+        fields_param = request.query_params.get(self.fields_query_param)
+        exclude_param = request.query_params.get(self.exclude_query_param)
+        list_fields = self.list_fields if self.action == "list" else None
+        if not fields_param and not exclude_param and list_fields is None:
+            return None
+
+        serializer_class = self.get_serializer_class()
+        all_fields = {
+            name: field for name, field in
+            serializer_class(context=self.get_serializer_context()).fields.items()
+            if not field.write_only
+        }
+        if fields_param:
+            names = self.parse_field_names(fields_param, all_fields, self.fields_query_param)
+        elif list_fields is not None:
+            names = self.get_list_field_names(list_fields, all_fields)
+        else:
+            names = list(all_fields)
+        if exclude_param:
+            excluded = self.parse_field_names(exclude_param, all_fields, self.exclude_query_param)
+            names = [name for name in names if name not in excluded]
+        return {name: all_fields[name] for name in names}
+
+    def get_list_field_names(self, list_fields, all_fields):
+        if list_fields == "auto":
+            model = getattr(getattr(self.get_serializer_class(), "Meta", None), "model", None)
+            return [name for name, field in all_fields.items() if not self.is_heavy_field(model, field)]
+        unknown = [name for name in list_fields if name not in all_fields]
+        if unknown:
+            raise ImproperlyConfigured(f"Unknown list_fields on {self.__class__.__name__}: {', '.join(unknown)}")
+        return list(list_fields)
+
+    def is_heavy_field(self, model, field):
+        if model is None or len(field.source_attrs) != 1:
+            return False
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return False
+        return isinstance(model_field, self.heavy_field_types)
+
+    def parse_field_names(self, value, all_fields, param):
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in names if name not in all_fields]
+        if unknown:
+            raise ValidationError({param: [_("Unknown field(s): {fields}.").format(fields=", ".join(unknown))]})
+        return names
+
+
+class FastSerializationMixin:
+    """
+    Serve list and export from `QuerySet.values()` rows when the serializer is one AdminSite generated.
+
+    The rows are rendered with converters precomputed from the serializer fields, without building
+    model instances or running the serializer field by field, and the output is the same. Serializers
+    with fields that need the instance (many to many, file fields...) keep the regular path, and so
+    do retrieve and writes. Set `fast_serialization = False` to turn it off.
+
+    With `list_mode = "values"` the list action renders the values() rows of any serializer whose
+    fields are all backed by columns, as the database returns them: the renderer encodes them
+    without the serializer fields' formatting.
+    """
+    fast_serialization = True
+    list_mode = None
+
+    def list(self, request, *args, **kwargs):
+        representation = self.get_values_representation()
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = self.get_values_queryset(queryset, representation, self.get_pagination_ordering(queryset))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(representation.to_representation(page))
+        return Response(representation.to_representation(queryset))
+
+    def iter_export_chunks(self, queryset):
+        representation = self.get_values_representation()
+        if representation is None:
+            yield from super().iter_export_chunks(queryset)
+            return
+
+        chunk = []
+        for row in self.get_values_queryset(queryset, representation).iterator(chunk_size=self.export_chunk_size):
+            chunk.append(row)
+            if len(chunk) == self.export_chunk_size:
+                yield representation.to_representation(chunk)
+                chunk = []
+        if chunk:
+            yield representation.to_representation(chunk)
+
+    def get_values_representation(self):
+        """The values() renderer of the serializer, None when the regular path has to be used"""
+        if self.list_mode == "values" and self.action == "list":
+            return get_values_representation(self.get_serializer(), raw=True)
+        if not self.fast_serialization or not issubclass(self.get_serializer_class(), AutoModelSerializer):
+            return None
+        return get_values_representation(self.get_serializer())
+
+    def get_values_queryset(self, queryset, representation, extra_names=()):
+        names = representation.names
+        # The cursor of keyset pagination is read from the ordering fields of the rows
+        names += [name for name in extra_names if name not in names]
+        return queryset.prefetch_related(None).values(*names)
+
+    def get_pagination_ordering(self, queryset):
+        if not isinstance(self.paginator, CursorPagination):
+            return ()
+        ordering = self.paginator.get_ordering(self.request, queryset, self)
+        return [name.lstrip("-") for name in ordering]
+
+
+class BulkModelMixin:
+    """
+    Create, update and delete a batch of objects in a single request.
+
+    Every item is validated with the serializer of the viewset. A batch is written
+    in one transaction with `bulk_create`/`bulk_update`, so `save()` and the model
+    signals are not called. Errors are returned per item, in the order of the items
+    sent, and nothing is written if any item is invalid.
+    """
+    bulk_max_batch_size = 1000
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        """Create a list of objects"""
+        items = self.get_bulk_items(request.data)
+        serializer = self.get_serializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            instances = self.perform_bulk_create(serializer)
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_201_CREATED)
+
+    @bulk.mapping.patch
+    def bulk_update(self, request, *args, **kwargs):
+        """Partially update a list of objects, each item has to carry the primary key of its object"""
+        items = self.get_bulk_items(request.data)
+        pk_name = self.get_queryset().model._meta.pk.name
+        instances = self.get_bulk_instances([item.get(pk_name) for item in items if isinstance(item, dict)])
+
+        serializers, errors = [], []
+        for item in items:
+            instance = instances.get(str(item.get(pk_name))) if isinstance(item, dict) else None
+            if instance is None:
+                errors.append({pk_name: [_("Not found.")]})
+                continue
+            serializer = self.get_serializer(instance, data=item, partial=True)
+            serializers.append(serializer)
+            errors.append({} if serializer.is_valid() else serializer.errors)
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            instances = self.perform_bulk_update(serializers)
+        return Response(self.get_serializer(instances, many=True).data)
+
+    @bulk.mapping.delete
+    def bulk_destroy(self, request, *args, **kwargs):
+        """Delete a list of objects by their primary keys"""
+        ids = self.get_bulk_items(request.data)
+        instances = self.get_bulk_instances(ids)
+        pk_name = self.get_queryset().model._meta.pk.name
+
+        errors = [{} if str(pk) in instances else {pk_name: [_("Not found.")]} for pk in ids]
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            deleted = self.perform_bulk_destroy(list(instances.values()))
+        return Response({"deleted": deleted})
+
+    def get_bulk_items(self, data):
+        """Check the payload is a list within the batch size limit"""
+        if not isinstance(data, list):
+            raise ValidationError({"non_field_errors": [_("Expected a list of items.")]})
+        if len(data) > self.bulk_max_batch_size:
+            raise ValidationError({"non_field_errors": [
+                _("Ensure this batch has no more than {limit} items.").format(limit=self.bulk_max_batch_size)]})
+        return data
+
+    def get_bulk_instances(self, ids):
+        """Fetch the objects of a batch in one query, keyed by their primary key as a string"""
+        queryset = self.filter_queryset(self.get_queryset())
+        valid_ids = []
+        for pk in ids:
+            try:
+                valid_ids.append(queryset.model._meta.pk.to_python(pk))
+            except (DjangoValidationError, TypeError):
+                # Invalid keys are reported as not found
+                continue
+        instances = {str(instance.pk): instance for instance in queryset.filter(pk__in=valid_ids)}
+        for instance in instances.values():
+            self.check_object_permissions(self.request, instance)
+        return instances
+
+    def perform_bulk_create(self, serializer):
+        return self.bulk_create_objects(serializer.validated_data)
+
+    def bulk_create_objects(self, validated_data):
+        """Create objects from a list of validated attributes, many to many relations are set afterwards"""
+        model = self.get_queryset().model
+        many_to_many = {field.name for field in model._meta.many_to_many}
+
+        instances, relations = [], []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            relations.append({name: attrs.pop(name) for name in many_to_many if name in attrs})
+            instances.append(model(**attrs))
+        model._default_manager.bulk_create(instances)
+
+        for instance, related in zip(instances, relations):
+            for name, value in related.items():
+                getattr(instance, name).set(value)
+        return instances
+
+    def perform_bulk_update(self, serializers):
+        if not serializers:
+            return []
+        model = self.get_queryset().model
+        many_to_many = {field.name for field in model._meta.many_to_many}
+        # bulk_update doesn't call pre_save, keep auto_now fields current
+        auto_now = [field for field in model._meta.concrete_fields if getattr(field, "auto_now", False)]
+
+        instances, update_fields = [], set()
+        for serializer in serializers:
+            instance = serializer.instance
+            for name, value in serializer.validated_data.items():
+                if name in many_to_many:
+                    getattr(instance, name).set(value)
+                else:
+                    setattr(instance, name, value)
+                    update_fields.add(name)
+            for field in auto_now:
+                field.pre_save(instance, add=False)
+                update_fields.add(field.name)
+            instances.append(instance)
+
+        if update_fields:
+            model._default_manager.bulk_update(instances, list(update_fields))
+        return instances
+
+    def perform_bulk_destroy(self, instances):
+        model = self.get_queryset().model
+        model._default_manager.filter(pk__in=[instance.pk for instance in instances]).delete()
+        return len(instances)
+
+
+class ExportModelMixin:
+    """
+    Stream every object of the model as NDJSON or CSV.
+
+    The format is picked with the Accept header or `?format=ndjson|csv`. Rows are read with
+    `QuerySet.iterator()` and serialized `export_chunk_size` at a time, so memory use doesn't
+    grow with the size of the table. The list filters of the viewset apply.
+    """
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=["get"], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = self.iter_export_chunks(queryset)
+
+        if isinstance(renderer, CSVRenderer):
+            header = [name for name, field in self.get_serializer().fields.items() if not field.write_only]
+            content = renderer.render_rows(chunks, header)
+        else:
+            content = renderer.render_rows(chunks)
+
+        response = StreamingHttpResponse(content, content_type=renderer.media_type)
+        filename = f"{queryset.model._meta.model_name}.{renderer.format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def iter_export_chunks(self, queryset):
+        """Serialize the queryset a chunk of rows at a time"""
+        chunk = []
+        for instance in queryset.iterator(chunk_size=self.export_chunk_size):
+            chunk.append(instance)
+            if len(chunk) == self.export_chunk_size:
+                yield self.get_serializer(chunk, many=True).data
+                chunk = []
+        if chunk:
+            yield self.get_serializer(chunk, many=True).data
+
+
+class ImportModelMixin:
+    """
+    Load objects from an NDJSON or CSV request body, the counterpart of `ExportModelMixin`.
+
+    The body is read as a stream, one line at a time, and handled `import_batch_size` rows at
+    a time. Each row is validated with the serializer of the viewset. Rows carrying the primary
+    key of an existing object update it, other rows are created, keeping their primary key if
+    they have one. Every batch is written in its own transaction with the bulk helpers of
+    `BulkModelMixin`, invalid rows are skipped and reported.
+    """
+    import_batch_size = 500
+    import_max_errors = 100
+
+    @action(detail=False, methods=["post"], url_path="import", url_name="import")
+    def import_rows(self, request, *args, **kwargs):
+        result = {"processed": 0, "created": 0, "updated": 0, "failed": 0, "errors": []}
+
+        batch = []
+        for row in self.iter_import_rows(request):
+            batch.append(row)
+            if len(batch) == self.import_batch_size:
+                self.import_batch(batch, result)
+                batch = []
+        if batch:
+            self.import_batch(batch, result)
+        return Response(result)
+
+    def iter_import_rows(self, request):
+        """Yield (row number, row) pairs, the row is an exception when it can't be parsed"""
+        stream = request.stream
+        if stream is None:
+            # No Content-Length, e.g a chunked upload, read the body of the Django request
+            stream = request._request
+        lines = iter(stream)
+        first_line = next(lines, None)
+        if first_line is None:
+            raise ParseError(_("The request body is empty."))
+        lines = itertools.chain([first_line], lines)
+        encoding = request.encoding or "utf-8"
+
+        if request.content_type.split(";")[0].strip() == CSVRenderer.media_type:
+            yield from self.iter_csv_rows(lines, encoding)
+            return
+
+        for number, line in enumerate(lines, start=1):
+            try:
+                line = line.decode(encoding)
+                if not line.strip():
+                    continue
+                yield number, json.loads(line)
+            except ValueError as exc:
+                # Invalid JSON, or bytes that aren't in the encoding
+                yield number, exc
+
+    def iter_csv_rows(self, lines, encoding):
+        """Yield (row number, row) pairs of a CSV body, rows spanning a line that can't be decoded are errors"""
+        decode_errors = {}
+
+        def decode(lines):
+            for line_number, line in enumerate(lines, start=1):
+                try:
+                    yield line.decode(encoding)
+                except UnicodeDecodeError as exc:
+                    decode_errors[line_number] = exc
+                    yield line.decode(encoding, errors="replace")
+
+        reader = csv.DictReader(decode(lines))
+        if reader.fieldnames is not None and decode_errors:
+            raise ParseError(_("The CSV header can't be decoded: {error}").format(
+                error=next(iter(decode_errors.values()))))
+        fields = self.get_serializer().fields
+        last_line = reader.line_num
+        for number, row in enumerate(reader, start=1):
+            errors = [decode_errors.pop(line_number) for line_number in range(last_line + 1, reader.line_num + 1)
+                      if line_number in decode_errors]
+            last_line = reader.line_num
+            yield number, errors[0] if errors else self.clean_csv_row(row, fields)
+
+    def clean_csv_row(self, row, fields):
+        """Undo the CSV encoding of the export: empty cells are nulls and nested values are JSON"""
+        cleaned = {}
+        for name, value in row.items():
+            field = fields.get(name)
+            if field is not None and value == "" and field.allow_null and not isinstance(field, CharField):
+                value = None
+            elif value and value[0] in "[{":
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            cleaned[name] = value
+        return cleaned
+
+    def import_batch(self, batch, result):
+        model = self.get_queryset().model
+        pk_field = model._meta.pk
+        pk_name = pk_field.name
+        existing = self.get_bulk_instances([row[pk_name] for _number, row in batch
+                                            if isinstance(row, dict) and row.get(pk_name) not in (None, "")])
+
+        creates, updates = [], []
+        for number, row in batch:
+            result["processed"] += 1
+            if not isinstance(row, dict):
+                self.add_import_error(result, number, {"non_field_errors": [str(row) or _("Invalid row.")]})
+                continue
+            pk = row.get(pk_name)
+            if pk in (None, ""):
+                pk = None
+            else:
+                try:
+                    pk = pk_field.to_python(pk)
+                except DjangoValidationError as exc:
+                    self.add_import_error(result, number, {pk_name: exc.messages})
+                    continue
+
+            instance = existing.get(str(pk)) if pk is not None else None
+            serializer = self.get_serializer(instance, data=row, partial=instance is not None)
+            if not serializer.is_valid():
+                self.add_import_error(result, number, serializer.errors)
+            elif instance is not None:
+                updates.append((number, serializer))
+            else:
+                attrs = dict(serializer.validated_data)
+                if pk is not None:
+                    attrs[pk_name] = pk
+                creates.append((number, attrs))
+
+        try:
+            with transaction.atomic():
+                self.bulk_create_objects([attrs for _number, attrs in creates])
+                self.perform_bulk_update([serializer for _number, serializer in updates])
+        except DatabaseError as exc:
+            # The whole batch is rolled back, e.g on a duplicated primary key
+            for number, _row in sorted(creates + updates, key=lambda item: item[0]):
+                self.add_import_error(result, number, {"non_field_errors": [str(exc)]})
+            return
+        result["created"] += len(creates)
+        result["updated"] += len(updates)
+
+    def add_import_error(self, result, number, errors):
+        result["failed"] += 1
+        if len(result["errors"]) < self.import_max_errors:
+            result["errors"].append({"row": number, "errors": errors})
+
+
+class AggregateModelMixin:
+    """
+    Count, sum, average, minimum and maximum of the objects, grouped by some fields, in one query.
+
+    `?group_by=a,b` groups by fields of `group_by_fields` and `?aggregate=count,price__sum` picks
+    the aggregates: `count` of the objects and `<field>__sum|avg|min|max` of the `aggregate_fields`,
+    sum and avg of number fields only. The filters and search of the list apply. The answer has one
+    row per group, ordered by the group_by fields, and is rejected past `aggregate_max_groups` groups.
+    """
+    group_by_fields = None # Indexed fields by default
+    aggregate_fields = None # Number and date fields by default
+    aggregate_max_groups = 1000
+    aggregate_functions = {"count": Count, "sum": Sum, "avg": Avg, "min": Min, "max": Max}
+
+    @action(detail=False, methods=["get"])
+    def aggregate(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        group_by = self.get_group_by(request, queryset.model)
+        aggregates = self.get_aggregates(request, queryset.model)
+        # The ordering of the list would be added to the GROUP BY
+        queryset = queryset.prefetch_related(None).order_by()
+        if not group_by:
+            return Response([queryset.aggregate(**aggregates)])
+
+        limit = self.aggregate_max_groups
+        rows = list(queryset.values(*group_by).annotate(**aggregates).order_by(*group_by)[:limit + 1])
+        if len(rows) > limit:
+            raise ValidationError({"group_by": [
+                _("More than {limit} groups, filter the objects first.").format(limit=limit)]})
+        return Response(rows)
+
+    def get_group_by(self, request, model):
+        names = [name.strip() for name in request.query_params.get("group_by", "").split(",") if name.strip()]
+        allowed = get_group_by_fields(self, model)
+        invalid = [name for name in names if name not in allowed]
+        if invalid:
+            raise ValidationError({"group_by": [
+                _("Grouping by {fields} is not allowed.").format(fields=", ".join(invalid))]})
+        return names
+
+    def get_aggregates(self, request, model):
+        names = [name.strip() for name in request.query_params.get("aggregate", "count").split(",") if name.strip()]
+        allowed = get_aggregate_fields(self, model)
+        aggregates, invalid = {}, []
+        for name in names or ["count"]:
+            if name == "count":
+                aggregates[name] = Count("pk")
+                continue
+            field_name, _separator, function = name.rpartition("__")
+            if function not in self.aggregate_functions or field_name not in allowed or (
+                    function in ("sum", "avg") and not _is_number_field(model._meta.get_field(field_name))):
+                invalid.append(name)
+                continue
+            aggregates[name] = self.aggregate_functions[function](field_name)
+        if invalid:
+            raise ValidationError({"aggregate": [
+                _("Unsupported aggregates {aggregates}.").format(aggregates=", ".join(invalid))]})
+        return aggregates
+
+
+def _is_number_field(model_field):
+    return isinstance(model_field, (models.IntegerField, models.FloatField, models.DecimalField))
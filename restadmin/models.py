@@ -0,0 +1,27 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ChangeLogEntry(models.Model):
+    """
+    A write to an object of a model registered with `track_changes`.
+
+    The primary key is the sequence number of the change feed, clients page through the
+    changes of a model with the last sequence number they have seen.
+    """
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ACTIONS = [(CREATED, "Created"), (UPDATED, "Updated"), (DELETED, "Deleted")]
+
+    model = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=255)
+    action = models.CharField(max_length=7, choices=ACTIONS)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["model", "id"], name="restadmin_changes_idx")]
+        verbose_name_plural = "change log entries"
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_id}"
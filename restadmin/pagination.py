@@ -0,0 +1,162 @@
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .queryset import get_indexed_fields
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination for large tables.
+
+    Pages are fetched with a `WHERE key < last_seen` lookup on an indexed ordering instead
+    of an OFFSET, and no COUNT query is run. The next and previous links are opaque cursors.
+    """
+    page_size = api_settings.PAGE_SIZE or 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    ordering = "-pk"
+
+
+def get_keyset_pagination_class(model, keyset_field=None):
+    """
+    Build a KeysetPagination subclass ordered by `keyset_field` or the primary key of the model.
+
+    The field has to be backed by a database index, prefix it with "-" for a descending order.
+    Non unique fields get the primary key added as a tie breaker.
+    """
+    pk_name = model._meta.pk.name
+    if keyset_field is None:
+        ordering = (f"-{pk_name}",)
+    else:
+        descending = keyset_field.startswith("-")
+        field_name = keyset_field.lstrip("-")
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"{model.__name__} has no field named {field_name}")
+        if field_name not in get_indexed_fields(model):
+            raise ImproperlyConfigured(
+                f"The keyset field {model.__name__}.{field_name} has to be backed by a database index")
+        if field.primary_key or field.unique:
+            ordering = (keyset_field,)
+        else:
+            ordering = (keyset_field, f"-{pk_name}" if descending else pk_name)
+
+    return type(f"{model.__name__}KeysetPagination", (KeysetPagination,), {"ordering": ordering})
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting large unfiltered tables from the catalog estimate of the database.
+
+    When the count is estimated, pages past the estimated end aren't rejected and whether
+    there is a next page is found by fetching one extra row, not from the count.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def estimated_count(self):
+        return estimate_count(self.object_list, self.estimate_threshold)
+
+    @property
+    def count_estimated(self):
+        return self.estimated_count is not None
+
+    @cached_property
+    def count(self):
+        if self.count_estimated:
+            return self.estimated_count
+        return super().count
+
+    def validate_number(self, number):
+        if not self.count_estimated:
+            return super().validate_number(number)
+        # The estimate may be short of the real count, pages past it are allowed
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return EstimatedPage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+class EstimatedPage(Page):
+
+    def __init__(self, object_list, number, paginator, has_next=False):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    Page number pagination that doesn't run an exact `COUNT(*)` on large tables.
+
+    Unfiltered querysets over `estimate_threshold` rows get the row estimate PostgreSQL keeps
+    in its catalog (`pg_class.reltuples`). Filtered or small querysets, other databases and
+    tables without statistics are counted exactly. The response tells which with `count_estimated`.
+    """
+    django_paginator_class = EstimatedCountPaginator
+    page_size = api_settings.PAGE_SIZE or 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.page.paginator.count,
+            "count_estimated": self.page.paginator.count_estimated,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_estimated"] = {"type": "boolean", "example": False}
+        return response_schema
+
+
+def estimate_count(queryset, threshold):
+    """
+    The catalog estimate of the number of rows of an unfiltered queryset, None when
+    the queryset is filtered, the database isn't PostgreSQL or the estimate is below `threshold`.
+    """
+    if not isinstance(queryset, QuerySet):
+        return None
+    query = queryset.query
+    if query.where or query.distinct or query.group_by or query.combinator or query.is_sliced:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    try:
+        # A savepoint inside an outer atomic block, a failed query would leave the transaction aborted on PostgreSQL
+        with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    # reltuples is -1 (or 0 on older versions) for tables that were never analyzed
+    if row is None or row[0] < threshold:
+        return None
+    return row[0]
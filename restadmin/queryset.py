@@ -0,0 +1,152 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import UniqueConstraint
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def get_related_lookups(model, fields, prefix="", to_many=False):
+    """
+    Work out the select_related and prefetch_related lookups needed to serialize
+    the given serializer fields of `model` without a query per row.
+
+    Returns a tuple of (select_related, prefetch_related) lists of lookups
+    """
+    select_related, prefetch_related = [], []
+
+    for field in fields.values():
+        if field.write_only:
+            continue
+
+        nested = field.child if isinstance(field, ListSerializer) else field
+        if field.source == "*":
+            # The whole instance is passed on to the field, nested serializers still need their relations
+            if isinstance(nested, BaseSerializer) and hasattr(nested, "fields"):
+                select, prefetch = get_related_lookups(model, nested.fields, prefix, to_many)
+                select_related += select
+                prefetch_related += prefetch
+            continue
+
+        current_model, path, field_to_many, consumed = model, [], to_many, True
+        for index, attr in enumerate(field.source_attrs):
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Properties and methods, nothing we can plan for
+                consumed = False
+                break
+            if not model_field.is_relation:
+                consumed = False
+                break
+
+            path.append(attr)
+            lookup = prefix + "__".join(path)
+            is_last = index == len(field.source_attrs) - 1
+            if model_field.many_to_many or model_field.one_to_many:
+                field_to_many = True
+                prefetch_related.append(lookup)
+            elif is_last and model_field.concrete and not _needs_related_object(field):
+                # Only the primary key is rendered, it is already on the row
+                break
+            elif field_to_many:
+                prefetch_related.append(lookup)
+            else:
+                select_related.append(lookup)
+            current_model = model_field.related_model
+
+        if consumed and path and isinstance(nested, BaseSerializer) and hasattr(nested, "fields"):
+            select, prefetch = get_related_lookups(
+                current_model, nested.fields, prefix + "__".join(path) + "__", field_to_many)
+            select_related += select
+            prefetch_related += prefetch
+
+    return _dedupe(select_related), _dedupe(prefetch_related)
+
+
+def plan_queryset(model, serializer_class, queryset=None):
+    """
+    Build a queryset for `model` with the related lookups needed by `serializer_class` applied.
+    """
+    if queryset is None:
+        queryset = model.objects.all()
+    try:
+        fields = serializer_class().fields
+    except Exception:
+        # Serializers that can not be introspected outside of a request get the plain queryset
+        return queryset
+
+    select_related, prefetch_related = get_related_lookups(model, fields)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+def narrow_queryset(queryset, fields):
+    """
+    Restrict the queryset to what the given serializer fields need: `.only()` the columns they
+    read and only the related lookups they traverse. The queryset is returned untouched when a
+    field reads something other than model fields, like a property or the whole instance.
+    """
+    model = queryset.model
+    columns, roots = {model._meta.pk.name}, set()
+    for field in fields.values():
+        if field.source == "*":
+            return queryset
+        root = field.source_attrs[0]
+        roots.add(root)
+        try:
+            model_field = model._meta.get_field(root)
+        except FieldDoesNotExist:
+            return queryset
+        if model_field.concrete and not model_field.many_to_many:
+            columns.add(root)
+
+    select_related, prefetch_related = get_related_lookups(model, fields)
+    # Prefetches of the queryset that selected fields still read, Prefetch objects may store under to_attr
+    kept = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if getattr(lookup, "prefetch_to", lookup).split("__")[0] in roots
+    ]
+    prefetches = {}
+    for lookup in kept + prefetch_related:
+        prefetches.setdefault(getattr(lookup, "prefetch_to", lookup), lookup)
+
+    queryset = queryset.select_related(None).prefetch_related(None).only(*columns)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    return queryset.prefetch_related(*prefetches.values())
+
+
+def get_indexed_fields(model):
+    """
+    Names of the concrete fields of `model` that lead a database index.
+    Only the leading column of a composite index is usable on its own.
+    """
+    opts = model._meta
+    indexed = {
+        field.name for field in opts.concrete_fields
+        if field.primary_key or field.unique or field.db_index
+    }
+    for index in opts.indexes:
+        if index.fields:
+            indexed.add(index.fields[0].lstrip("-"))
+    for unique_together in opts.unique_together:
+        indexed.add(unique_together[0])
+    for constraint in opts.constraints:
+        if isinstance(constraint, UniqueConstraint) and constraint.fields:
+            indexed.add(constraint.fields[0])
+    return indexed
+
+
+def _needs_related_object(field):
+    """Check if rendering the field needs more than the primary key of the related object"""
+    if isinstance(field, ManyRelatedField):
+        field = field.child_relation
+    if isinstance(field, RelatedField):
+        return not field.use_pk_only_optimization()
+    return True
+
+
+def _dedupe(lookups):
+    return list(dict.fromkeys(lookups))
@@ -0,0 +1,162 @@
+import csv
+import decimal
+import io
+import json
+import uuid
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# The conversions of the JSONEncoder of DRF for the types serializers commonly leave in the data
+_msgpack_converters = {decimal.Decimal: float, uuid.UUID: str}
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson, the output decodes to the same values.
+
+    orjson writes datetimes, dates, times and UUIDs itself, values it doesn't know (Decimal, lazy
+    strings...) go through the `default` of the JSONEncoder of DRF. Floats in exponent notation
+    are written without the `+` and the leading zeros of the exponent (`1e16`, not `1e+16`).
+    Indented, ASCII only, non compact or non strict output, and values orjson can't encode, are
+    left to JSONRenderer. NaN and infinities are written as null, where JSONRenderer raises.
+    """
+    options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def __init__(self):
+        assert orjson, "Using ORJSONRenderer, but `orjson` is not installed."
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (self.get_indent(accepted_media_type, renderer_context or {}) or self.ensure_ascii
+                or not self.compact or not self.strict):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers past 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, escape the line separators that are invalid in javascript
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer for MessagePack, picked with `Accept: application/msgpack` or `?format=msgpack`.
+
+    Values are the ones of the JSON representation, except timezone aware datetimes which are
+    MessagePack timestamps. Decimals and UUIDs are converted to floats and strings without going
+    through the JSONEncoder of DRF, which encodes the other values msgpack doesn't know.
+    """
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    encoder_class = encoders.JSONEncoder
+
+    def __init__(self):
+        assert msgpack, "Using MessagePackRenderer, but `msgpack` is not installed."
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=self.get_default(), use_bin_type=True, datetime=True)
+
+    def get_default(self):
+        encoder_default = self.encoder_class().default
+
+        def default(value):
+            converter = _msgpack_converters.get(type(value))
+            return converter(value) if converter else encoder_default(value)
+
+        return default
+
+
+def get_renderer_classes():
+    """
+    DEFAULT_RENDERER_CLASSES with JSONRenderer replaced by ORJSONRenderer when orjson is installed,
+    and MessagePackRenderer added when msgpack is.
+    """
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES)
+    if orjson is not None:
+        renderer_classes = [ORJSONRenderer if renderer is JSONRenderer else renderer for renderer in renderer_classes]
+    if msgpack is not None:
+        renderer_classes.append(MessagePackRenderer)
+    return renderer_classes
+
+
+class NDJSONRenderer(JSONRenderer):
+    """
+    Renderer for newline delimited JSON, one object per line.
+
+    `render_rows` renders an iterable of rows a chunk at a time for streaming responses.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(self.render_rows([rows]))
+
+    def render_rows(self, chunks):
+        for rows in chunks:
+            yield "".join(
+                json.dumps(row, cls=self.encoder_class, ensure_ascii=self.ensure_ascii, separators=(",", ":")) + "\n"
+                for row in rows
+            ).encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renderer for CSV with a header row. Nested values are written as JSON.
+
+    `render_rows` renders an iterable of rows a chunk at a time for streaming responses.
+    """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        header = list(rows[0].keys()) if rows else []
+        return b"".join(self.render_rows([rows], header))
+
+    def render_rows(self, chunks, header):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        # Send the header right away, before the first rows are fetched
+        yield self._flush(buffer)
+        for rows in chunks:
+            for row in rows:
+                writer.writerow([self.format_value(row.get(name)) for name in header])
+            yield self._flush(buffer)
+
+    def _flush(self, buffer):
+        content = buffer.getvalue().encode(self.charset)
+        buffer.seek(0)
+        buffer.truncate()
+        return content
+
+    def format_value(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+        return value
@@ -1,8 +1,35 @@
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAdminUser
+from rest_framework.settings import api_settings
 
+from .caching import CacheResponseMixin, ConditionalGetMixin
+from .changes import ChangeFeedMixin
+from .filters import FieldFilter, IndexedOrderingFilter
+from .instrumentation import InstrumentationMixin, NPlusOneDetectionMixin
+from .mixins import (AggregateModelMixin, BulkModelMixin, ExportModelMixin, FastSerializationMixin,
+                     ImportModelMixin, SparseFieldsMixin)
+from .renderers import get_renderer_classes
+from .routing import ReadReplicaMixin
+from .search import FullTextSearchFilter
 
-class RestModelAdmin(ModelViewSet):
+
+class default_from_settings:
+    """
+    Class attribute read from the DRF settings on every access, so settings changed after the import
+    (override_settings in tests) are followed. Setting the attribute on a subclass or passing it to
+    `as_view` replaces it.
+    """
+
+    def __init__(self, method_name):
+        self.method_name = method_name
+
+    def __get__(self, instance, owner=None):
+        return getattr(owner, self.method_name)()
+
+
+class RestModelAdmin(InstrumentationMixin, NPlusOneDetectionMixin, ReadReplicaMixin, CacheResponseMixin,
+                     ConditionalGetMixin, SparseFieldsMixin, FastSerializationMixin, ChangeFeedMixin, BulkModelMixin,
+                     ExportModelMixin, ImportModelMixin, AggregateModelMixin, ModelViewSet):
     """Equivalent to ModelAdmin, behave like a ModelViewSet
     
     This class is an abstraction layer between this packages
@@ -11,3 +38,20 @@ class RestModelAdmin(ModelViewSet):
     """
     
     permission_classes = [IsAdminUser] # By default allow admin users only
+    optimize_queryset = True # Add the related lookups the serializer needs to the default queryset
+    filter_backends = default_from_settings("get_default_filter_backends")
+    renderer_classes = default_from_settings("get_default_renderer_classes")
+    filter_fields = None # Indexed fields by default
+    ordering_fields = None # Indexed fields by default
+    search_fields = None
+    full_text_search = False # Search the search_fields with the full text index of the database
+
+    @classmethod
+    def get_default_filter_backends(cls):
+        """DEFAULT_FILTER_BACKENDS followed by the field, full text search and indexed ordering filters"""
+        return [*api_settings.DEFAULT_FILTER_BACKENDS, FieldFilter, FullTextSearchFilter, IndexedOrderingFilter]
+
+    @classmethod
+    def get_default_renderer_classes(cls):
+        """DEFAULT_RENDERER_CLASSES with the orjson and MessagePack renderers when they are installed"""
+        return get_renderer_classes()
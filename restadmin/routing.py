@@ -0,0 +1,50 @@
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+
+class ReadReplicaMixin:
+    """
+    Run the queries of safe requests (list, retrieve, export...) on the `read_using` database.
+
+    Writes stay on the default database. After a successful write a user reads from the default
+    database for `read_your_writes_timeout` seconds, so they see their changes while the replica
+    catches up. The window is kept in the cache of `cache_alias`, shared by all the processes.
+    """
+    read_using = None
+    read_your_writes_timeout = 5
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        alias = self.get_read_database()
+        if alias is None:
+            return queryset
+        return queryset.using(alias)
+
+    def get_read_database(self):
+        """The database alias the request reads from, None to leave the queryset's own"""
+        request = getattr(self, "request", None)
+        if not self.read_using or request is None or request.method not in SAFE_METHODS:
+            return None
+        if not hasattr(self, "_read_database"):
+            key = self.get_read_your_writes_key(request)
+            recent_write = key is not None and caches[self.get_read_cache_alias()].get(key) is not None
+            self._read_database = None if recent_write else self.read_using
+        return self._read_database
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.read_using and request.method not in SAFE_METHODS and response.status_code < 400:
+            key = self.get_read_your_writes_key(request)
+            if key is not None:
+                caches[self.get_read_cache_alias()].set(key, True, self.read_your_writes_timeout)
+        return response
+
+    def get_read_your_writes_key(self, request):
+        """Writes of the user pin their reads to the default database, None for anonymous requests"""
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        return f"restadmin:read-your-writes:user:{user.pk}"
+
+    def get_read_cache_alias(self):
+        return getattr(self, "cache_alias", "default")
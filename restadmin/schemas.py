@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+
+import rest_framework
+from django.conf import settings
+from django.urls import path
+from django.utils.cache import get_conditional_response
+from rest_framework import exceptions, renderers
+from rest_framework.compat import coreapi
+from rest_framework.response import Response
+from rest_framework.schemas import coreapi as coreapi_schemas, openapi
+from rest_framework.schemas.views import SchemaView
+
+
+class SchemaClassMixin:
+    """Inspect the views with `schema_class`, whatever DEFAULT_SCHEMA_CLASS is"""
+    schema_class = None
+
+    def create_view(self, callback, method, request=None):
+        view = super().create_view(callback, method, request)
+        if not isinstance(view.schema, self.schema_class):
+            schema = self.schema_class()
+            schema.view = view
+            view.schema = schema
+        return view
+
+
+class CoreAPISchemaGenerator(SchemaClassMixin, coreapi_schemas.SchemaGenerator):
+    schema_class = coreapi_schemas.AutoSchema
+
+
+class OpenAPISchemaGenerator(SchemaClassMixin, openapi.SchemaGenerator):
+    schema_class = openapi.AutoSchema
+
+
+class SchemaCache:
+    """
+    The coreapi and OpenAPI schemas of an AdminSite, generated once per registry fingerprint.
+
+    The fingerprint is a hash of the routes, viewsets, serializers and their fields, worked out
+    again only after `register`/`unregister` changed the registry. With a `cache_dir` (the
+    RESTADMIN_SCHEMA_CACHE_DIR setting by default) the schemas are also stored on disk, where
+    other processes, and the `restadmin_schema` management command, share them.
+    """
+    kinds = ("coreapi", "openapi")
+
+    def __init__(self, site, title=None, cache_dir=None):
+        self.site = site
+        self.title = title
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._fingerprint = (None, None)
+        self._schemas = {}
+
+    def get_cache_dir(self):
+        return self.cache_dir or getattr(settings, "RESTADMIN_SCHEMA_CACHE_DIR", None)
+
+    def get_fingerprint(self):
+        version, fingerprint = self._fingerprint
+        if version != self.site.registry_version:
+            version = self.site.registry_version
+            fingerprint = self.compute_fingerprint()
+            self._fingerprint = (version, fingerprint)
+        return fingerprint
+
+    def compute_fingerprint(self):
+        parts = [rest_framework.VERSION, self.title or ""]
+        for prefix, viewset, basename in self.site.admin_router.registry:
+            serializer_class = viewset.serializer_class
+            try:
+                fields = list(serializer_class().fields) if serializer_class else []
+            except Exception:
+                fields = []
+            parts.append(":".join((prefix, basename, _dotted_path(viewset), _dotted_path(serializer_class),
+                                   ",".join(fields))))
+        return hashlib.md5("\n".join(parts).encode()).hexdigest()
+
+    def get(self, kind):
+        """Return the schema of `kind` and its fingerprint, generating it when the registry changed"""
+        fingerprint = self.get_fingerprint()
+        cached = self._schemas.get(kind)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1], fingerprint
+
+        with self._lock:
+            cached = self._schemas.get(kind)
+            if cached is None or cached[0] != fingerprint:
+                schema = self.load(kind, fingerprint)
+                if schema is None:
+                    schema = self.generate(kind)
+                    self.store(kind, fingerprint, schema)
+                self._schemas[kind] = (fingerprint, schema)
+            return self._schemas[kind][1], fingerprint
+
+    def generate(self, kind):
+        patterns = list(self.site.urls[0])
+        if kind == "coreapi":
+            return CoreAPISchemaGenerator(title=self.title, patterns=patterns).get_schema(public=True)
+        if kind == "openapi":
+            return OpenAPISchemaGenerator(title=self.title, patterns=patterns).get_schema(public=True)
+        raise ValueError(f"Unknown schema kind {kind!r}")
+
+    def get_path(self, kind, fingerprint):
+        cache_dir = self.get_cache_dir()
+        if not cache_dir:
+            return None
+        return os.path.join(cache_dir, f"restadmin-{kind}-{fingerprint}.json")
+
+    def load(self, kind, fingerprint):
+        file_path = self.get_path(kind, fingerprint)
+        if file_path is None or not os.path.exists(file_path):
+            return None
+        with open(file_path, "rb") as schema_file:
+            content = schema_file.read()
+        if kind == "coreapi":
+            return coreapi.codecs.CoreJSONCodec().decode(content)
+        return json.loads(content)
+
+    def store(self, kind, fingerprint, schema):
+        file_path = self.get_path(kind, fingerprint)
+        if file_path is None or schema is None:
+            return
+        if kind == "coreapi":
+            content = coreapi.codecs.CoreJSONCodec().encode(schema)
+        else:
+            content = renderers.JSONOpenAPIRenderer().render(schema)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        temporary_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as schema_file:
+            schema_file.write(content)
+        os.replace(temporary_path, file_path)
+
+    def prerender(self):
+        """Generate every kind of schema now and store it in the cache directory, returns the fingerprint"""
+        for kind in self.kinds:
+            schema, fingerprint = self.get(kind)
+            file_path = self.get_path(kind, fingerprint)
+            if file_path is not None and not os.path.exists(file_path):
+                # Generated before the cache directory was set
+                self.store(kind, fingerprint, schema)
+        return self.get_fingerprint()
+
+
+class CachedSchemaView(SchemaView):
+    """Serve a schema of the SchemaCache, with an ETag of the registry fingerprint"""
+    schema_cache = None
+    kind = "coreapi"
+
+    def get(self, request, *args, **kwargs):
+        schema, fingerprint = self.schema_cache.get(self.kind)
+        if schema is None:
+            raise exceptions.PermissionDenied()
+        if self.kind == "coreapi":
+            # Links are relative to the url the document is served from
+            schema = coreapi.Document(url=request.build_absolute_uri(), title=schema.title,
+                                      description=schema.description, content=schema.data)
+
+        # The docs page shows the user it is rendered for
+        user = getattr(request.user, "pk", None) if request.accepted_renderer.format == "html" else None
+        etag = '"%s"' % hashlib.md5(f"{fingerprint}:{request.accepted_media_type}:{user}".encode()).hexdigest()
+        response = Response(schema, headers={"ETag": etag})
+        return get_conditional_response(request, etag=etag, response=response)
+
+
+def get_docs_urls(schema_cache, authentication_classes=None, permission_classes=None):
+    """The docs page, the schema.js of its client, the coreapi schema and the OpenAPI schema"""
+    options = {"schema_cache": schema_cache, "public": True}
+    if authentication_classes is not None:
+        options["authentication_classes"] = authentication_classes
+    if permission_classes is not None:
+        options["permission_classes"] = permission_classes
+
+    docs_view = CachedSchemaView.as_view(
+        renderer_classes=[renderers.DocumentationRenderer, renderers.CoreJSONRenderer], **options)
+    schema_js_view = CachedSchemaView.as_view(renderer_classes=[renderers.SchemaJSRenderer], **options)
+    openapi_view = CachedSchemaView.as_view(
+        kind="openapi", renderer_classes=[renderers.JSONOpenAPIRenderer, renderers.OpenAPIRenderer], **options)
+    return [
+        path('', docs_view, name='docs-index'),
+        path('schema.js', schema_js_view, name='schema-js'),
+        path('openapi/', openapi_view, name='openapi'),
+    ]
+
+
+def _dotted_path(cls):
+    if cls is None:
+        return ""
+    return f"{cls.__module__}.{cls.__qualname__}"
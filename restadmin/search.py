@@ -0,0 +1,199 @@
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import connections
+from django.db.backends.utils import truncate_name
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+# (database alias, index name) -> whether the index exists
+_index_exists = {}
+
+
+class SearchBackend(ABC):
+    """
+    Full text search over the `search_fields` of a model, backed by an index of the database.
+
+    `create_index` builds the index and keeps it in sync with the table, `search` filters a
+    queryset by the search terms and orders it by relevance, annotated as `search_rank`.
+    """
+    vendor = None
+
+    def __init__(self, using="default"):
+        self.using = using
+        self.connection = connections[using]
+
+    def get_index_name(self, model):
+        return truncate_name(f"{model._meta.db_table}_restadmin_search", self.connection.ops.max_name_length())
+
+    def index_exists(self, model):
+        key = (self.using, self.get_index_name(model))
+        if key not in _index_exists:
+            _index_exists[key] = self.check_index(model)
+        return _index_exists[key]
+
+    @abstractmethod
+    def check_index(self, model):
+        """Whether the index of the model exists in the database"""
+
+    @abstractmethod
+    def create_index(self, model, search_fields):
+        """Create the index of the search fields and index the rows already in the table"""
+
+    @abstractmethod
+    def drop_index(self, model):
+        """Drop the index of the model, if it exists"""
+
+    @abstractmethod
+    def search(self, queryset, terms, search_fields):
+        """The queryset filtered by the terms, annotated with `search_rank` and ordered by it"""
+
+    def get_columns(self, model, search_fields):
+        return [model._meta.get_field(name).column for name in search_fields]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    `SearchVector` matches backed by a GIN expression index on the vector of the search fields.
+
+    The text search configuration is the RESTADMIN_SEARCH_CONFIG setting, "simple" by default.
+    """
+    vendor = "postgresql"
+
+    def get_config(self):
+        return getattr(settings, "RESTADMIN_SEARCH_CONFIG", "simple")
+
+    def get_vector(self, search_fields):
+        from django.contrib.postgres.search import SearchVector
+        return SearchVector(*search_fields, config=self.get_config())
+
+    def check_index(self, model):
+        with self.connection.cursor() as cursor:
+            constraints = self.connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return self.get_index_name(model) in constraints
+
+    def create_index(self, model, search_fields):
+        from django.contrib.postgres.indexes import GinIndex
+        # The index expression is the one `search` filters on, so the planner can use it
+        index = GinIndex(self.get_vector(search_fields), name=self.get_index_name(model))
+        with self.connection.schema_editor() as schema_editor:
+            schema_editor.add_index(model, index)
+
+    def drop_index(self, model):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {self.connection.ops.quote_name(self.get_index_name(model))}")
+
+    def search(self, queryset, terms, search_fields):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        vector = self.get_vector(search_fields)
+        query = SearchQuery(" ".join(terms), config=self.get_config())
+        return queryset.annotate(search_vector=vector).filter(search_vector=query).annotate(
+            search_rank=SearchRank(vector, query)).order_by("-search_rank", "pk")
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    An FTS5 table over the search fields, using the model table as its external content.
+
+    Triggers on the model table keep the FTS table in sync. Rows are ranked with bm25.
+    The primary key of the model has to be an integer, it is the rowid of the FTS table.
+    """
+    vendor = "sqlite"
+
+    def check_index(self, model):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                           [self.get_index_name(model)])
+            return cursor.fetchone() is not None
+
+    def create_index(self, model, search_fields):
+        quote = self.connection.ops.quote_name
+        fts, table, pk = quote(self.get_index_name(model)), quote(model._meta.db_table), quote(model._meta.pk.column)
+        columns = [quote(column) for column in self.get_columns(model, search_fields)]
+        names = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        name = self.get_index_name(model)
+
+        statements = [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content={table}, content_rowid={pk})",
+            f"CREATE TRIGGER {quote(name + '_ai')} AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.{pk}, {new_values}); END",
+            f"CREATE TRIGGER {quote(name + '_ad')} AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.{pk}, {old_values}); END",
+            f"CREATE TRIGGER {quote(name + '_au')} AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.{pk}, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.{pk}, {new_values}); END",
+            # Index the rows already in the table
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+        with self.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def drop_index(self, model):
+        quote = self.connection.ops.quote_name
+        name = self.get_index_name(model)
+        with self.connection.cursor() as cursor:
+            for suffix in ("_ai", "_ad", "_au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {quote(name + suffix)}")
+            cursor.execute(f"DROP TABLE IF EXISTS {quote(name)}")
+
+    def search(self, queryset, terms, search_fields):
+        quote = self.connection.ops.quote_name
+        model = queryset.model
+        fts, table, pk = quote(self.get_index_name(model)), quote(model._meta.db_table), quote(model._meta.pk.column)
+        # Every term is quoted so FTS5 query syntax in the input is searched for literally
+        match = " ".join('"%s"' % term.replace('"', '""') for term in terms)
+        matches = RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", (match,))
+        rank = RawSQL(f"SELECT -rank FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = {table}.{pk}", (match,))
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by("-search_rank", "pk")
+
+
+SEARCH_BACKENDS = {backend.vendor: backend for backend in (PostgresSearchBackend, SQLiteSearchBackend)}
+
+
+def get_search_backend(using="default"):
+    """The search backend of the database, None when full text search isn't supported on it"""
+    backend_class = SEARCH_BACKENDS.get(connections[using].vendor)
+    return backend_class(using) if backend_class else None
+
+
+def clear_index_cache():
+    _index_exists.clear()
+
+
+def check_search_fields(model, search_fields):
+    """Raise ImproperlyConfigured unless the search fields are text columns of the model's own table"""
+    if not search_fields:
+        raise ImproperlyConfigured(f"full_text_search on {model.__name__} requires search_fields")
+    for name in search_fields:
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or not model_field.concrete or model_field.is_relation:
+            raise ImproperlyConfigured(
+                f"full_text_search can only index the columns of {model.__name__}, not {name!r}")
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter using the full text search index of the model when the view has `full_text_search`.
+
+    Results are ordered by relevance unless `?ordering=` or keyset pagination order them. Without
+    an index, or on databases without a backend, it falls back to the `icontains` search of
+    SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = self.get_search_terms(request)
+        if not getattr(view, "full_text_search", False) or not search_fields or not terms:
+            return super().filter_queryset(request, queryset, view)
+
+        backend = get_search_backend(queryset.db)
+        if backend is None or not backend.index_exists(queryset.model):
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, terms, search_fields)
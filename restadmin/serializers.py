@@ -0,0 +1,109 @@
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models.query_utils import DeferredAttribute
+from rest_framework import serializers
+from rest_framework.fields import Field
+
+
+class AutoModelSerializer(serializers.ModelSerializer):
+    """Base of the serializers AdminSite generates for the models registered without one"""
+
+
+class ValuesRepresentation:
+    """
+    Render rows fetched with `QuerySet.values()` the same way the serializer renders model instances.
+
+    `columns` are (field name, values() key, converter) tuples in the order of the serializer fields.
+    Like `Serializer.to_representation`, None values are not converted.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @property
+    def names(self):
+        return [key for _field_name, key, _convert in self.columns]
+
+    def to_representation(self, rows):
+        columns = self.columns
+        data = []
+        for row in rows:
+            item = {}
+            for field_name, key, convert in columns:
+                value = row[key]
+                item[field_name] = None if value is None else convert(value)
+            data.append(item)
+        return data
+
+
+class RawValuesRepresentation(ValuesRepresentation):
+    """Render values() rows as the database returns them, leaving the values to the renderer's encoder"""
+
+    def to_representation(self, rows):
+        field_names = [field_name for field_name, _key, _convert in self.columns]
+        keys = self.names
+        return [dict(zip(field_names, [row[key] for key in keys])) for row in rows]
+
+
+def get_values_representation(serializer, raw=False):
+    """
+    Precompute the per-field converters rendering values() rows like `serializer` renders instances.
+
+    Only serializers whose readable fields all read a concrete column straight from the instance
+    qualify: model fields with a plain attribute and foreign keys rendered as their primary key.
+    Returns None for any other serializer.
+
+    With `raw` every field backed by a concrete column qualifies and its values are not converted,
+    foreign keys are rendered as the primary key. Other fields raise ImproperlyConfigured.
+    """
+    target = getattr(serializer, "child", serializer)
+    model = getattr(getattr(target, "Meta", None), "model", None)
+    if model is None or not hasattr(target, "fields"):
+        if raw:
+            raise ImproperlyConfigured("list_mode='values' requires a ModelSerializer")
+        return None
+
+    columns, unsupported = [], []
+    for field in target._readable_fields:
+        model_field = _get_column(model, field)
+        if model_field is None:
+            unsupported.append(field.field_name)
+            continue
+
+        if raw:
+            convert = None
+        elif model_field.is_relation and type(field) is serializers.PrimaryKeyRelatedField:
+            # The field renders the primary key of the related row, which is the column itself
+            convert = field.pk_field.to_representation if field.pk_field is not None else _identity
+        elif (not model_field.is_relation and type(field).get_attribute is Field.get_attribute
+              and model_field.descriptor_class is DeferredAttribute):
+            convert = field.to_representation
+        else:
+            # Descriptors like FileField's wrap the column value, and ModelField reads the whole instance
+            unsupported.append(field.field_name)
+            continue
+        columns.append((field.field_name, model_field.attname, convert))
+
+    if not unsupported:
+        return RawValuesRepresentation(columns) if raw else ValuesRepresentation(columns)
+    if raw:
+        raise ImproperlyConfigured(
+            f"list_mode='values' can only render the fields backed by a column of {model.__name__}, "
+            f"not {', '.join(unsupported)}")
+    return None
+
+
+def _get_column(model, field):
+    """The concrete model field the serializer field reads, None if it reads anything else"""
+    if len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or model_field.many_to_many:
+        return None
+    return model_field
+
+
+def _identity(value):
+    return value
@@ -1,12 +1,24 @@
+from django.conf import settings
 from django.db.models.base import ModelBase
 from django.core.exceptions import ImproperlyConfigured
-from rest_framework import serializers, viewsets, routers, permissions
+from django.urls import URLResolver, include, path
+from django.urls.resolvers import RegexPattern
+from rest_framework import serializers, routers, permissions
 from rest_framework.settings import api_settings
 from rest_framework.permissions import BasePermission
-from rest_framework.documentation import include_docs_urls
-from typing import Type, List, Union
+from typing import Callable, Dict, Type, List, Union
 
+from .asyncadmin import AsyncRestModelAdmin, check_async_support
+from .batch import BatchView
+from .caching import connect_cache_invalidation, disconnect_cache_invalidation
+from .changes import connect_change_tracking, disconnect_change_tracking
+from .filters import check_filter_options
+from .pagination import EstimatedCountPagination, get_keyset_pagination_class
+from .queryset import plan_queryset
+from .schemas import SchemaCache, get_docs_urls
+from .search import check_search_fields
 from .restmodeladmin import RestModelAdmin
+from .serializers import AutoModelSerializer, get_values_representation
 
 
 class AlreadyRegistered(Exception):
@@ -21,18 +33,153 @@ class AdminModel:
     pass
 
 
+class LazyURLConf:
+    """The urlpatterns of an AdminSite, only built when Django first reads them"""
+
+    def __init__(self, site):
+        self.site = site
+
+    @property
+    def urlpatterns(self):
+        return self.site.get_urls()
+
+    def __iter__(self):
+        return iter(self.urlpatterns)
+
+    def __len__(self):
+        return len(self.urlpatterns)
+
+    def __getitem__(self, index):
+        return self.urlpatterns[index]
+
+
 class AdminSite:
+    batch_view_class = BatchView
+
+    def __init__(self, lazy: bool = True, read_using: str = None):
+        """
+        With `lazy` registering a model only records it. Its serializer and viewset are generated,
+        and the urls routed, when the registry or the urls are first used. Call `warmup` to build
+        them all upfront, e.g. before the workers of a preforking server are forked.
+
+        `read_using` is the database alias the safe requests of every registered model read from,
+        see the `read_using` option of `register`.
+        """
+        self.lazy = lazy
+        self.read_using = read_using
+        self._pending = {}
+        self._built = {}
+        # The model signals each registration connected, see _connect_signals
+        self._signals = {}
+        self._router = routers.DefaultRouter()
+        # Bumped on every change of the registry, the cached schemas are checked against it
+        self.registry_version = 0
+        self.schema_cache = SchemaCache(self, title="RestAdmin Endpoints Documentation")
+        self._resolver = (None, None)
+        self._batch_url = None
+
+    @property
+    def _registry(self):
+        self._build_pending()
+        return self._built
+
+    @property
+    def admin_router(self):
+        self._build_pending()
+        return self._router
 
-    def __init__(self):
-        self._registry = {}
-        self.admin_router = routers.DefaultRouter()
+    def warmup(self):
+        """Build the pending registrations and the urls now instead of on first use"""
+        self._build_pending()
+        self._router.urls
 
     def register(self, model_or_iterable, serializer_or_modeladmin: Union[serializers.ModelSerializer, RestModelAdmin] = None,
-                 permission_classes: List[Type[BasePermission]] = None, pagination_class=None):
+                 permission_classes: List[Type[BasePermission]] = None, pagination_class=None,
+                 optimize_queryset: bool = True, pagination_mode: str = None, keyset_field: str = None,
+                 bulk_max_batch_size: int = None, conditional_get: bool = None, timestamp_field: str = None,
+                 cache_timeout: int = None, list_fields: Union[List[str], str] = None, async_mode: bool = False,
+                 query_budget: int = None, metrics_hooks: List[Callable] = None, list_mode: str = None,
+                 filter_fields: Union[List[str], Dict[str, List[str]]] = None, ordering_fields: List[str] = None,
+                 search_fields: List[str] = None, full_text_search: bool = None,
+                 track_changes: bool = None, read_using: str = None, group_by_fields: List[str] = None,
+                 aggregate_fields: List[str] = None):
         """
         Register Models to the AdminSite. Generates a serializer or uses the one passed.
+
+        With `optimize_queryset` the queryset gets the select_related/prefetch_related lookups
+        the serializer needs. Pass False to opt out for the model.
+
+        `pagination_mode="keyset"` pages through the model with keyset pagination ordered by
+        the primary key or by `keyset_field`, which has to be backed by a database index.
+        `pagination_mode="estimated"` uses page numbers with the row estimate of the database
+        instead of an exact count for large unfiltered tables.
+
+        The other options are set as attributes of the viewset. The ones left to None keep the
+        value of the viewset, or of the RestModelAdmin passed.
+
+        `bulk_max_batch_size` limits the number of items accepted by the bulk endpoints.
+
+        `conditional_get` adds ETag/Last-Modified headers to list and retrieve and answers conditional
+        requests with a 304. `timestamp_field` names the field updated on every save, the first
+        `auto_now` DateTimeField by default.
+
+        `cache_timeout` caches the rendered list and retrieve responses for that many seconds.
+        Writes through the viewsets and the model signals invalidate them.
+
+        `list_fields` are the fields returned by the list action, the detail action still returns
+        them all. "auto" leaves out TextField, JSONField and BinaryField columns.
+
+        `async_mode` generates an AsyncRestModelAdmin viewset, served by async handlers under ASGI.
+        Subclass AsyncRestModelAdmin to get the same with a custom RestModelAdmin.
+
+        `query_budget` is the number of SQL queries a request may run before it is logged, or fails
+        when RESTADMIN_QUERY_BUDGET_ACTION is "raise". `metrics_hooks` are called with the request
+        and its query count and timings after every request.
+
+        `list_mode="values"` fetches the list rows with `values()` and renders the column values
+        as they are, without model instances or the serializer fields' formatting.
+
+        `filter_fields` and `ordering_fields` are the fields the list can be filtered (`?age__gte=3`)
+        and ordered (`?ordering=-age`) by, the fields backed by a database index by default.
+        `filter_fields` can also map each field to its allowed lookups. `search_fields` are searched
+        by `?search=`.
+
+        `full_text_search` searches the `search_fields` with the full text index of the database,
+        ranked by relevance. The `restadmin_search_index` management command creates the indexes.
+
+        `track_changes` records every write to the model in the change log and serves it from the
+        `changes` endpoint, `?since=` the sequence number of the last change seen.
+
+        `read_using` is the database alias, e.g. a replica, list, retrieve and the other safe requests
+        read from, the site's `read_using` by default. Writes stay on the default database and a user
+        who just wrote reads from it for a few seconds.
+
+        `group_by_fields` and `aggregate_fields` are the fields the `aggregate` endpoint groups by,
+        the indexed fields by default, and computes sums, averages, minimums and maximums of, the
+        number and date fields by default.
         """
 
+        options = {
+            'bulk_max_batch_size': bulk_max_batch_size,
+            'conditional_get': conditional_get,
+            'timestamp_field': timestamp_field,
+            'cache_timeout': cache_timeout,
+            'list_fields': list_fields,
+            'query_budget': query_budget,
+            'metrics_hooks': metrics_hooks,
+            'list_mode': list_mode,
+            'filter_fields': filter_fields,
+            'ordering_fields': ordering_fields,
+            'search_fields': search_fields,
+            'full_text_search': full_text_search,
+            'track_changes': track_changes,
+            'read_using': read_using,
+            'group_by_fields': group_by_fields,
+            'aggregate_fields': aggregate_fields,
+        }
+        # The options set as attributes of the viewset, None leaves the viewset's own value
+        options = {name: value for name, value in options.items() if value is not None}
+
         if isinstance(model_or_iterable, ModelBase):
             model_or_iterable = [model_or_iterable]
         for model in model_or_iterable:
@@ -40,82 +187,230 @@ class AdminSite:
                 raise ImproperlyConfigured(
                     f"The model {model.__name__} is abstract. It cannot be registered with admin")
 
-            if model in self._registry:
+            if self.is_registered(model):
                 raise AlreadyRegistered(f"The model {model.__name__} has already been registered")
-            model_name = model.__name__
-            
-            if serializer_or_modeladmin and issubclass(serializer_or_modeladmin, serializers.ModelSerializer):
-                serializer_class = serializer_or_modeladmin
-            elif serializer_or_modeladmin and issubclass(serializer_or_modeladmin, RestModelAdmin):
-                self._register_restmodel_admin(model, serializer_or_modeladmin)
-                continue
-            else:
-                serializer_class = type(f"{model_name}Serializer", (serializers.ModelSerializer,), {
-                    'Meta': type('Meta', (object,), {
-                        'model': model,
-                        'fields': '__all__'
-                    })
-                })
-
-            generated_viewset_permission_class = permission_classes or [permissions.IsAdminUser]
-            generated_viewset_pagination_class = pagination_class or api_settings.DEFAULT_PAGINATION_CLASS
-
-            viewset = type(f"{model_name}ViewSet", (viewsets.ModelViewSet,), {
-                'queryset': model.objects.all(),
-                'permission_classes': generated_viewset_permission_class,
-                'pagination_class': generated_viewset_pagination_class,
-                'serializer_class': serializer_class,
+            if list_mode not in (None, "values"):
+                raise ImproperlyConfigured(f"Unknown list mode {list_mode!r}")
+            mode_pagination_class = self._get_pagination_class(model, pagination_mode, keyset_field)
+            if pagination_class and mode_pagination_class:
+                raise ImproperlyConfigured("Pass either a pagination_class or a pagination_mode, not both")
+            if async_mode:
+                check_async_support()
+            check_filter_options(model, filter_fields, ordering_fields, group_by_fields, aggregate_fields)
+            model_options = dict(options)
+            if self.read_using is not None and _get_option(serializer_or_modeladmin, model_options, "read_using") is None:
+                model_options["read_using"] = self.read_using
+            database = model_options.get("read_using")
+            if database is not None and database not in settings.DATABASES:
+                raise ImproperlyConfigured(f"Unknown database {database!r} for read_using")
+            if full_text_search and search_fields is not None:
+                check_search_fields(model, search_fields)
+            self._check_list_fields(model, serializer_or_modeladmin, model_options)
+
+            # Only record the registration, the classes are built on first access of the registry
+            self._pending[model] = (serializer_or_modeladmin, model_options, {
+                'permission_classes': permission_classes,
+                'pagination_class': pagination_class,
+                'mode_pagination_class': mode_pagination_class,
+                'optimize_queryset': optimize_queryset,
+                'async_mode': async_mode,
             })
-            self._registry[model] = viewset
-            #
-            self.admin_router.register(f"{model._meta.app_label}/{model_name}", viewset, f"admin_{model_name}")
-    
-    def _register_restmodel_admin(self, model, restmodeladmin):
+            # Writes made before the first request, or by processes that never route one, are seen too
+            self._connect_signals(model, serializer_or_modeladmin, model_options)
+            self.registry_version += 1
+        if not self.lazy:
+            self._build_pending()
+
+    def _build_pending(self):
+        """Build the viewsets of the recorded registrations, in the order they were registered"""
+        while self._pending:
+            model = next(iter(self._pending))
+            serializer_or_modeladmin, options, registration = self._pending.pop(model)
+            self._build(model, serializer_or_modeladmin, options, **registration)
+
+    def _build(self, model, serializer_or_modeladmin, options, permission_classes=None, pagination_class=None,
+               mode_pagination_class=None, optimize_queryset=True, async_mode=False):
+        """Generate the serializer and viewset of a registered model and route it"""
+        model_name = model.__name__
+        if serializer_or_modeladmin and issubclass(serializer_or_modeladmin, serializers.ModelSerializer):
+            serializer_class = serializer_or_modeladmin
+        elif serializer_or_modeladmin and issubclass(serializer_or_modeladmin, RestModelAdmin):
+            self._register_restmodel_admin(model, serializer_or_modeladmin, options,
+                                           optimize_queryset=optimize_queryset,
+                                           pagination_class=mode_pagination_class)
+            return
+        else:
+            serializer_class = self._get_default_serializer(model)
+
+        generated_viewset_permission_class = permission_classes or [permissions.IsAdminUser]
+        generated_viewset_pagination_class = (pagination_class or mode_pagination_class or
+                                              api_settings.DEFAULT_PAGINATION_CLASS)
+
+        if optimize_queryset:
+            queryset = plan_queryset(model, serializer_class)
+        else:
+            queryset = model.objects.all()
+
+        viewset_base = AsyncRestModelAdmin if async_mode else RestModelAdmin
+        viewset = type(f"{model_name}ViewSet", (viewset_base,), {
+            'queryset': queryset,
+            'permission_classes': generated_viewset_permission_class,
+            'pagination_class': generated_viewset_pagination_class,
+            'serializer_class': serializer_class,
+        })
+        self._apply_options(viewset, options)
+        self._check_list_mode(viewset)
+        self._built[model] = viewset
+        #
+        self._router.register(f"{model._meta.app_label}/{model_name}", viewset, f"admin_{model_name}")
+
+    def _register_restmodel_admin(self, model, restmodeladmin, options, **kwargs):
         """Register RestModelAdmin"""
 
-        self._setup_default_modeladmin(model, restmodeladmin)
+        self._setup_default_modeladmin(model, restmodeladmin, options, **kwargs)
+        self._check_list_mode(restmodeladmin)
 
-        self._registry[model] = restmodeladmin
+        self._built[model] = restmodeladmin
         #
-        self.admin_router.register(f"{model._meta.app_label}/{model.__name__}", restmodeladmin, f"admin_{model.__name__}")
+        self._router.register(f"{model._meta.app_label}/{model.__name__}", restmodeladmin, f"admin_{model.__name__}")
 
-    def _setup_default_modeladmin(self, model, restmodeladmin):
+    def _setup_default_modeladmin(self, model, restmodeladmin, options, optimize_queryset=True, pagination_class=None):
         """Check for required attributes and set defaults if not given"""
-        
-        # No queryset or get_queryset defined
-        if restmodeladmin.queryset is None and not 'get_queryset' in restmodeladmin.__dict__:
-            restmodeladmin.queryset = model.objects.all()
-        
+
+        self._apply_options(restmodeladmin, options)
+
+        # A pagination mode was asked for at registration and the class doesn't set its own
+        if pagination_class and 'pagination_class' not in restmodeladmin.__dict__:
+            restmodeladmin.pagination_class = pagination_class
+
         # No serializer class or get_serializer_class defined
         if restmodeladmin.serializer_class is None and not 'get_serializer_class' in restmodeladmin.__dict__:
-            restmodeladmin.serializer_class = type(f"{model.__name__}Serializer", (serializers.ModelSerializer,), {
-                'Meta': type('Meta', (object,), {
-                    'model': model,
-                    'fields': '__all__'
-                })
+            restmodeladmin.serializer_class = self._get_default_serializer(model)
+
+        # No queryset or get_queryset defined
+        if restmodeladmin.queryset is None and not 'get_queryset' in restmodeladmin.__dict__:
+            if optimize_queryset and restmodeladmin.optimize_queryset and restmodeladmin.serializer_class:
+                restmodeladmin.queryset = plan_queryset(model, restmodeladmin.serializer_class)
+            else:
+                restmodeladmin.queryset = model.objects.all()
+
+    def _apply_options(self, viewset, options):
+        """Set the options given at registration as attributes of the viewset"""
+        for name, value in options.items():
+            setattr(viewset, name, value)
+
+    def _check_list_fields(self, model, serializer_or_modeladmin, options):
+        """Fail at registration when list_fields names a field the serializer doesn't return"""
+        list_fields = _get_option(serializer_or_modeladmin, options, "list_fields")
+        if list_fields is None or list_fields == "auto":
+            return
+        if serializer_or_modeladmin and issubclass(serializer_or_modeladmin, RestModelAdmin):
+            if serializer_or_modeladmin.get_serializer_class is not RestModelAdmin.get_serializer_class:
+                # The serializer is picked per request, its fields are checked on the first list
+                return
+            serializer_class = serializer_or_modeladmin.serializer_class
+        else:
+            serializer_class = serializer_or_modeladmin
+        try:
+            fields = (serializer_class or self._get_default_serializer(model))().fields
+        except Exception:
+            return
+        unknown = [name for name in list_fields if name not in fields or fields[name].write_only]
+        if unknown:
+            raise ImproperlyConfigured(f"Unknown list_fields for {model.__name__}: {', '.join(unknown)}")
+
+    def _check_list_mode(self, viewset):
+        """Fail at registration when the list of the viewset can't be rendered from values()"""
+        if viewset.list_mode != "values" or viewset.serializer_class is None:
+            return
+        try:
+            serializer = viewset.serializer_class()
+            fields = serializer.fields
+        except Exception:
+            # Serializers that can not be introspected outside of a request are checked on their first list
+            return
+        if viewset.list_fields is not None:
+            readable = {name: field for name, field in fields.items() if not field.write_only}
+            listed = viewset(action="list", format_kwarg=None).get_list_field_names(viewset.list_fields, readable)
+            for name in list(fields):
+                if name not in listed:
+                    fields.pop(name)
+        get_values_representation(serializer, raw=True)
+
+    def _connect_signals(self, model, serializer_or_modeladmin, options):
+        """Hook the model signals the viewset features rely on"""
+        cache_alias = None
+        if _get_option(serializer_or_modeladmin, options, "cache_timeout") is not None:
+            cache_alias = _get_option(serializer_or_modeladmin, options, "cache_alias")
+            connect_cache_invalidation(model, cache_alias, owner=self)
+        track_changes = bool(_get_option(serializer_or_modeladmin, options, "track_changes"))
+        if track_changes:
+            connect_change_tracking(model, owner=self)
+        self._signals[model] = (cache_alias, track_changes)
+
+    def _disconnect_signals(self, model):
+        """Unhook the model signals of this site, the ones other sites rely on stay connected"""
+        cache_alias, track_changes = self._signals.pop(model, (None, False))
+        if cache_alias is not None:
+            disconnect_cache_invalidation(model, cache_alias, owner=self)
+        if track_changes:
+            disconnect_change_tracking(model, owner=self)
+
+    def _get_pagination_class(self, model, pagination_mode, keyset_field=None):
+        """Build the pagination class for a pagination mode, None when no mode is given"""
+        if pagination_mode is None:
+            if keyset_field:
+                raise ImproperlyConfigured("keyset_field requires pagination_mode='keyset'")
+            return None
+        if pagination_mode == "keyset":
+            return get_keyset_pagination_class(model, keyset_field)
+        if keyset_field:
+            raise ImproperlyConfigured("keyset_field requires pagination_mode='keyset'")
+        if pagination_mode == "estimated":
+            return EstimatedCountPagination
+        raise ImproperlyConfigured(f"Unknown pagination mode {pagination_mode!r}")
+
+    def _get_default_serializer(self, model):
+        """Generate a ModelSerializer exposing all the fields of the model"""
+        return type(f"{model.__name__}Serializer", (AutoModelSerializer,), {
+            'Meta': type('Meta', (object,), {
+                'model': model,
+                'fields': '__all__'
             })
+        })
 
     def get_registry(self):
         return self._registry
 
-    # def get_urls(self):
-    #     url_patterns = []
-    #     for model, admin_site in self._registry.items():
-    #         self.admin_router.register()
+    def get_urls(self):
+        """The urls of the registered models and the batch route"""
+        if self._batch_url is None:
+            self._batch_url = path("batch/", self.batch_view_class.as_view(site=self), name="batch")
+        return [self._batch_url, *self.admin_router.urls]
+
+    def get_resolver(self):
+        """Resolve the paths of the batch requests, only to the urls of the registered models"""
+        self._build_pending()
+        version, resolver = self._resolver
+        if version != self.registry_version:
+            resolver = URLResolver(RegexPattern(r"^"), self._router.urls)
+            self._resolver = (self.registry_version, resolver)
+        return resolver
 
     @property
     def urls(self):
         """
 
         :return: the router urlconf object, appname, and url namespace
+        The urlconf builds the registrations and routes them when Django first resolves a url.
         """
-        return self.admin_router.urls, "restadmin", "restadmin"
+        return LazyURLConf(self), "restadmin", "restadmin"
 
     def is_registered(self, model):
         """
         Check If a model is registered
         """
-        return model in self._registry
+        return model in self._pending or model in self._built
 
     def unregister(self, model):
         """
@@ -123,17 +418,37 @@ class AdminSite:
         Then delete from our registry
         """
         model_name = model.__name__
-        if model not in self._registry:
+        if model not in self._pending and model not in self._built:
             raise NotRegistered(f"The model {model_name} has not been registered")
-        viewset = self._registry[model]
-        self.admin_router.registry.remove((f"{model._meta.app_label}/{model_name}", viewset, f"admin_{model_name}"))
-        del self._registry[model]
+        self.registry_version += 1
+        self._disconnect_signals(model)
+        if model in self._pending:
+            del self._pending[model]
+            return
+        viewset = self._built[model]
+        self._router.registry.remove((f"{model._meta.app_label}/{model_name}", viewset, f"admin_{model_name}"))
+        if hasattr(self._router, "_urls"):
+            # Let the router compile its urls again
+            del self._router._urls
+        del self._built[model]
 
     @property
     def docs(self):
-        urls = self.urls
-        return include_docs_urls(title="RestAdmin Endpoints Documentation", public=True, patterns=urls[0],
-                                 permission_classes=[permissions.IsAdminUser])
+        """
+        The docs page of the registered endpoints with its coreapi schema, and the OpenAPI schema
+        under `openapi/`. Schemas are generated once per state of the registry, see SchemaCache.
+        """
+        urls = get_docs_urls(self.schema_cache, permission_classes=[permissions.IsAdminUser])
+        return include((urls, 'api-docs'), namespace='api-docs')
+
+
+def _get_option(serializer_or_modeladmin, options, name):
+    """The value of a viewset option, given at registration or set on the RestModelAdmin"""
+    if name in options:
+        return options[name]
+    if isinstance(serializer_or_modeladmin, type) and issubclass(serializer_or_modeladmin, RestModelAdmin):
+        return getattr(serializer_or_modeladmin, name)
+    return getattr(RestModelAdmin, name)
 
 
 site = AdminSite()
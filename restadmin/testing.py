@@ -0,0 +1,32 @@
+import asyncio
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+def audit_site(site, user=None):
+    """
+    Run the list endpoint of every model registered to `site` with the N+1 detector on.
+
+    Returns the findings of the offending models, keyed by model, an empty dict when no endpoint
+    repeats a query per row. Seed at least two rows per model first and pass a `user` allowed
+    to list them. Models served by async handlers are skipped.
+
+        self.assertEqual(audit_site(site, superuser), {})
+    """
+    factory = APIRequestFactory()
+    report = {}
+    for model, viewset in site.get_registry().items():
+        if asyncio.iscoroutinefunction(viewset.dispatch):
+            continue
+        request = factory.get("/")
+        if user is not None:
+            force_authenticate(request, user)
+        response = viewset.as_view({"get": "list"}, detect_nplusone="record")(request)
+        if response.status_code != 200:
+            raise AssertionError(f"Listing {model.__name__} answered {response.status_code}")
+
+        view = getattr(response, "renderer_context", {}).get("view")
+        findings = getattr(view, "nplusone_findings", None)
+        if findings:
+            report[model] = findings
+    return report
@@ -30,6 +30,11 @@ setup(
     packages=[],
     include_package_data=True,
     install_requires=["Django>=3.2.9", "djangorestframework", "coreapi"],
+    extras_require={
+        "orjson": ["orjson>=3.6"],
+        "msgpack": ["msgpack>=1.0"],
+        "fast": ["orjson>=3.6", "msgpack>=1.0"],
+    },
     package_dir={"": "restadmin"},
     python_requires='>=3',
     test_suite='load_tests.get_suite'
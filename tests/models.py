@@ -14,3 +14,41 @@ class TestModel(TestAbstractModel):
 
 class SecondTestModel(TestAbstractModel):
     age = models.IntegerField()
+
+
+class TagTestModel(TestAbstractModel):
+    pass
+
+
+class RelatedTestModel(TestAbstractModel):
+    parent = models.ForeignKey(TestModel, on_delete=models.CASCADE, related_name="related")
+    tags = models.ManyToManyField(TagTestModel, blank=True)
+
+
+class TimestampedTestModel(TestAbstractModel):
+    age = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class DocumentTestModel(TestAbstractModel):
+    body = models.TextField(blank=True)
+    data = models.JSONField(null=True, blank=True)
+    blob = models.BinaryField(null=True, blank=True)
+
+
+class PricedTestModel(TestAbstractModel):
+    parent = models.ForeignKey(TestModel, on_delete=models.CASCADE, null=True, blank=True)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    released = models.DateField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+
+
+class ReservedNamesTestModel(TestAbstractModel):
+    page = models.IntegerField(default=1)
+    format = models.CharField(max_length=10, blank=True)
+    ordering = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["id"]
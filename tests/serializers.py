@@ -1,4 +1,5 @@
 from rest_framework.serializers import ModelSerializer
+from .models import RelatedTestModel
 
 
 class AdminSerializer(ModelSerializer):
@@ -6,3 +7,9 @@ class AdminSerializer(ModelSerializer):
         model = None
         fields = "__all__"
 
+
+class NestedParentSerializer(ModelSerializer):
+    class Meta:
+        model = RelatedTestModel
+        fields = "__all__"
+        depth = 1
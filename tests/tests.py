@@ -1,26 +1,86 @@
-from rest_framework.test import APITestCase, override_settings, APIRequestFactory, URLPatternsTestCase
+import asyncio
+import csv
+import datetime
+import decimal
+import io
+import json
+import os
+import tempfile
+import uuid
+import django
+from rest_framework.test import (APITestCase, APITransactionTestCase, override_settings, APIRequestFactory,
+                                 URLPatternsTestCase, force_authenticate)
 from rest_framework.viewsets import ModelViewSet
+from rest_framework.request import Request
 from rest_framework.permissions import IsAdminUser
+from rest_framework.filters import BaseFilterBackend
 from rest_framework.settings import api_settings
+from rest_framework.renderers import JSONRenderer
 from rest_framework.serializers import ModelSerializer
-from tests.models import TestModel, TestAbstractModel, SecondTestModel
-from tests.serializers import AdminSerializer
+from tests.models import (TestModel, TestAbstractModel, SecondTestModel, RelatedTestModel, TagTestModel,
+                          TimestampedTestModel, DocumentTestModel, PricedTestModel,
+                          ReservedNamesTestModel)
+from tests.serializers import AdminSerializer, NestedParentSerializer
 from tests.permissions import ReadOnly
 from tests.pagination import LargeResultsSetPagination
 from tests.restmodeladmin import TestRestModelAdmin, SecondTestRestModelAdmin
 from restadmin.sites import AdminSite, AlreadyRegistered, NotRegistered
-from restadmin import register, RestModelAdmin
+from restadmin.instrumentation import QueryBudgetExceeded, NPlusOneDetected
+from restadmin.testing import audit_site
+from restadmin.schemas import SchemaCache
+from restadmin.search import clear_index_cache, get_search_backend
+from restadmin.renderers import ORJSONRenderer, MessagePackRenderer, get_renderer_classes, msgpack, orjson
+from restadmin.pagination import (KeysetPagination, EstimatedCountPagination, EstimatedCountPaginator,
+                                  estimate_count)
+from unittest import mock, skipUnless
+from restadmin import register, RestModelAdmin, AsyncRestModelAdmin
+from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command, CommandError
 from django.urls import path, reverse
 from django.contrib.auth.models import User
 from django.template.response import TemplateResponse
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections, transaction
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _lazy
 import pdb
 
+# AsyncRestModelAdmin runs on the async ORM of Django 4.2
+ASYNC_VIEWSETS = django.VERSION >= (4, 2)
+
 
 # Create your tests here.
 
 
+class AdminViewTestMixin:
+    """Calls the views of the viewsets directly, authenticated as a superuser"""
+
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(
+            username="super", password="secret", email="super@example.com"
+        )
+        self.factory = APIRequestFactory()
+
+    def call_view(self, viewset, actions, request, user=None, initkwargs=None, **kwargs):
+        force_authenticate(request, user or self.superuser)
+        # The router passes the options of extra actions (renderer_classes of export...) as initkwargs
+        action = getattr(viewset, next(iter(actions.values())))
+        view = viewset.as_view(actions, **{**getattr(action, "kwargs", {}), **(initkwargs or {})})
+        if asyncio.iscoroutinefunction(view):
+            response = async_to_sync(view)(request, **kwargs)
+        else:
+            response = view(request, **kwargs)
+        if not getattr(response, "streaming", False) and hasattr(response, "render"):
+            response.render()
+        return response
+
+
 class TestRegistration(APITestCase):
     def setUp(self):
         self.site = AdminSite()
@@ -47,6 +107,45 @@ class TestRegistration(APITestCase):
         self.site.register(TestModel)
         self.assertEqual(self.site._registry, self.site.get_registry())
 
+    def test_lazy_registration(self):
+        with mock.patch("restadmin.sites.plan_queryset") as plan_queryset:
+            self.site.register([TestModel, RelatedTestModel])
+            plan_queryset.assert_not_called()
+        self.assertTrue(self.site.is_registered(TestModel))
+        self.assertEqual(self.site._built, {})
+        with self.assertRaises(AlreadyRegistered):
+            self.site.register(TestModel)
+
+        self.assertEqual(list(self.site.get_registry()), [TestModel, RelatedTestModel])
+        self.assertEqual(self.site.get_registry()[TestModel].serializer_class.__name__, "TestModelSerializer")
+
+    def test_unregister_pending(self):
+        self.site.register(TestModel)
+        self.site.unregister(TestModel)
+        self.assertFalse(self.site.is_registered(TestModel))
+        self.assertEqual(self.site.get_registry(), {})
+
+    def test_lazy_urls(self):
+        self.site.register(TestModel)
+        urlconf, app_name, namespace = self.site.urls
+        self.assertEqual(self.site._built, {})
+        names = [pattern.name for pattern in urlconf.urlpatterns]
+        self.assertIn("admin_TestModel-list", names)
+        self.assertEqual(list(urlconf), urlconf.urlpatterns)
+        self.site.unregister(TestModel)
+        self.assertNotIn("admin_TestModel-list", [pattern.name for pattern in urlconf])
+
+    def test_warmup(self):
+        self.site.register(TestModel)
+        self.site.warmup()
+        self.assertIn(TestModel, self.site._built)
+        self.assertTrue(hasattr(self.site._router, "_urls"))
+
+    def test_eager_registration(self):
+        site = AdminSite(lazy=False)
+        site.register(TestModel)
+        self.assertIn(TestModel, site._built)
+
     def test_abstract_model_registration(self):
         with self.assertRaises(ImproperlyConfigured):
             self.site.register(TestAbstractModel)
@@ -99,6 +198,151 @@ class TestRegistration(APITestCase):
         self.assertQuerysetEqual(self.site._registry[TestModel].queryset, TestModel.objects.all(), ordered=False)
         self.assertEqual(self.site._registry[TestModel].serializer_class.__name__, 'TestModelSerializer')
 
+    def test_default_queryset_related_lookups(self):
+        self.site.register(RelatedTestModel)
+        queryset = self.site._registry[RelatedTestModel].queryset
+        # The parent is rendered as a primary key so no join is needed
+        self.assertFalse(queryset.query.select_related)
+        self.assertEqual(queryset._prefetch_related_lookups, ("tags",))
+
+    def test_nested_serializer_related_lookups(self):
+        self.site.register(RelatedTestModel, serializer_or_modeladmin=NestedParentSerializer)
+        queryset = self.site._registry[RelatedTestModel].queryset
+        self.assertEqual(queryset.query.select_related, {"parent": {}})
+        self.assertEqual(queryset._prefetch_related_lookups, ("tags",))
+
+    def test_restmodeladmin_related_lookups(self):
+        class RelatedRestModelAdmin(RestModelAdmin):
+            pass
+        self.site.register(RelatedTestModel, RelatedRestModelAdmin)
+        self.site.warmup()
+        self.assertEqual(RelatedRestModelAdmin.queryset._prefetch_related_lookups, ("tags",))
+
+    def test_optimize_queryset_opt_out(self):
+        self.site.register(RelatedTestModel, optimize_queryset=False)
+        queryset = self.site._registry[RelatedTestModel].queryset
+        self.assertEqual(queryset._prefetch_related_lookups, ())
+
+    def test_keyset_pagination_registration(self):
+        self.site.register(TestModel, pagination_mode="keyset")
+        pagination_class = self.site._registry[TestModel].pagination_class
+        self.assertTrue(issubclass(pagination_class, KeysetPagination))
+        self.assertEqual(pagination_class.ordering, ("-id",))
+
+    def test_keyset_pagination_indexed_field(self):
+        self.site.register(RelatedTestModel, pagination_mode="keyset", keyset_field="parent")
+        self.assertEqual(self.site._registry[RelatedTestModel].pagination_class.ordering, ("parent", "id"))
+
+    def test_keyset_pagination_unindexed_field(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.site.register(TestModel, pagination_mode="keyset", keyset_field="age")
+
+    def test_keyset_pagination_with_pagination_class(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.site.register(TestModel, pagination_mode="keyset", pagination_class=LargeResultsSetPagination)
+
+    def test_keyset_pagination_restmodeladmin(self):
+        class KeysetRestModelAdmin(RestModelAdmin):
+            pass
+        self.site.register(TestModel, KeysetRestModelAdmin, pagination_mode="keyset")
+        self.site.warmup()
+        self.assertTrue(issubclass(KeysetRestModelAdmin.pagination_class, KeysetPagination))
+
+    def test_bulk_max_batch_size_registration(self):
+        self.site.register(TestModel, bulk_max_batch_size=10)
+        self.assertEqual(self.site._registry[TestModel].bulk_max_batch_size, 10)
+
+    def test_conditional_get_registration(self):
+        self.site.register(TimestampedTestModel, conditional_get=False, timestamp_field="updated_at")
+        self.assertFalse(self.site._registry[TimestampedTestModel].conditional_get)
+        self.assertEqual(self.site._registry[TimestampedTestModel].timestamp_field, "updated_at")
+
+    def test_cache_timeout_registration(self):
+        self.site.register(TestModel, cache_timeout=30)
+        self.assertEqual(self.site._registry[TestModel].cache_timeout, 30)
+        self.site.unregister(TestModel)
+
+    def test_signals_connected_at_registration(self):
+        from restadmin.caching import get_cache_generation
+        from restadmin.models import ChangeLogEntry
+
+        self.site.register(TestModel, track_changes=True, cache_timeout=60)
+        generation = get_cache_generation(TestModel)
+        with self.captureOnCommitCallbacks(execute=True):
+            TestModel.objects.create(name="before warmup", age=1)
+        # Nothing read the registry or the urls yet
+        self.assertIn(TestModel, self.site._pending)
+        self.assertEqual(ChangeLogEntry.objects.filter(model="tests.testmodel").count(), 1)
+        self.assertGreater(get_cache_generation(TestModel), generation)
+
+        self.site.unregister(TestModel)
+        with self.captureOnCommitCallbacks(execute=True):
+            TestModel.objects.create(name="after unregister", age=1)
+        self.assertEqual(ChangeLogEntry.objects.filter(model="tests.testmodel").count(), 1)
+
+    def test_signals_of_other_sites(self):
+        from restadmin.caching import get_cache_generation
+        from restadmin.models import ChangeLogEntry
+
+        other_site = AdminSite()
+        self.site.register(TestModel, track_changes=True, cache_timeout=60)
+        other_site.register(TestModel, track_changes=True, cache_timeout=60)
+        other_site.unregister(TestModel)
+        generation = get_cache_generation(TestModel)
+        with self.captureOnCommitCallbacks(execute=True):
+            TestModel.objects.create(name="name", age=1)
+        # Still connected for self.site, and only once
+        self.assertEqual(get_cache_generation(TestModel), generation + 2)
+        self.assertEqual(ChangeLogEntry.objects.filter(model="tests.testmodel").count(), 1)
+        self.site.unregister(TestModel)
+
+    def test_unknown_option(self):
+        with self.assertRaises(TypeError):
+            self.site.register(TestModel, cache_timout=30)
+
+    def test_options_override_restmodeladmin(self):
+        class OptionsRestModelAdmin(RestModelAdmin):
+            cache_timeout = 30
+            conditional_get = False
+
+        self.site.register(TestModel, OptionsRestModelAdmin, cache_timeout=None, conditional_get=True)
+        self.assertIs(self.site._registry[TestModel], OptionsRestModelAdmin)
+        self.assertEqual(OptionsRestModelAdmin.cache_timeout, 30)
+        self.assertTrue(OptionsRestModelAdmin.conditional_get)
+        self.site.unregister(TestModel)
+
+    def test_list_fields_registration(self):
+        self.site.register(TestModel, list_fields=["name"])
+        self.assertEqual(self.site._registry[TestModel].list_fields, ["name"])
+
+    def test_unknown_list_fields(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "nope"):
+            self.site.register(TestModel, list_fields=["name", "nope"])
+        self.assertFalse(self.site.is_registered(TestModel))
+
+    def test_estimated_pagination_registration(self):
+        self.site.register(TestModel, pagination_mode="estimated")
+        self.assertEqual(self.site._registry[TestModel].pagination_class, EstimatedCountPagination)
+
+    def test_unknown_pagination_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.site.register(TestModel, pagination_mode="unknown")
+
+    @skipUnless(ASYNC_VIEWSETS, "async_mode requires Django 4.2")
+    def test_async_mode_registration(self):
+        self.site.register(TestModel, async_mode=True)
+        viewset = self.site._registry[TestModel]
+        self.assertTrue(issubclass(viewset, AsyncRestModelAdmin))
+        self.assertTrue(asyncio.iscoroutinefunction(viewset.as_view({"get": "list"})))
+
+    def test_async_mode_requires_django_4_2(self):
+        with mock.patch("django.VERSION", (4, 0, 4, "final", 0)):
+            with self.assertRaises(ImproperlyConfigured):
+                self.site.register(TestModel, async_mode=True)
+            with self.assertRaises(ImproperlyConfigured):
+                type("OldDjangoRestModelAdmin", (AsyncRestModelAdmin,), {})
+        self.assertFalse(self.site.is_registered(TestModel))
+
     def test_register_decorator(self):
         @register(TestModel, site=self.site)
         class DecoratorRestModelAdmin(RestModelAdmin):
@@ -133,6 +377,10 @@ class TestRegistration(APITestCase):
 
 site = AdminSite()
 site.register(TestModel)
+site.register(RelatedTestModel)
+site.register(TagTestModel, pagination_mode="keyset")
+site.register(TimestampedTestModel)
+site.register(DocumentTestModel, list_fields="auto")
 
 register(SecondTestModel, site=site)(SecondTestRestModelAdmin)
 
@@ -227,4 +475,1403 @@ class TestViewSets(APITestCase):
         response = self.client.patch(url, data={"age": 15})
         new_object = SecondTestModel.objects.get(id=model_object.id)
         self.assertEqual(new_object.age, 15)
-        
\ No newline at end of file
+
+    def test_list_related_objects_query_count(self):
+        parent = TestModel.objects.create(name="parent", age=40)
+        tags = [TagTestModel.objects.create(name=str(i)) for i in range(3)]
+        for i in range(5):
+            related = RelatedTestModel.objects.create(name=str(i), parent=parent)
+            related.tags.set(tags)
+        url = reverse("restadmin:admin_RelatedTestModel-list")
+        # Session, user, the rows and a single prefetch for the tags
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(len(response.json()[0]["tags"]), 3)
+
+    def test_keyset_pagination_list(self):
+        tags = [TagTestModel.objects.create(name=str(i)) for i in range(5)]
+        url = reverse("restadmin:admin_TagTestModel-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"page_size": 2})
+        self.assertFalse([query for query in queries if "COUNT(" in query["sql"].upper()])
+        self.assertEqual([row["id"] for row in response.json()["results"]], [tags[4].id, tags[3].id])
+
+        response = self.client.get(response.json()["next"])
+        self.assertEqual([row["id"] for row in response.json()["results"]], [tags[2].id, tags[1].id])
+
+    def test_bulk_create_endpoint(self):
+        url = reverse("restadmin:admin_TestModel-bulk")
+        response = self.client.post(url, data=[{"name": "one", "age": 1}, {"name": "two", "age": 2}], format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TestModel.objects.count(), 2)
+        self.assertEqual([row["name"] for row in response.json()], ["one", "two"])
+
+    def test_bulk_create_endpoint_errors(self):
+        url = reverse("restadmin:admin_TestModel-bulk")
+        response = self.client.post(url, data=[{"name": "one", "age": 1}, {"name": "two"}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0], {})
+        self.assertIn("age", response.json()["errors"][1])
+        self.assertEqual(TestModel.objects.count(), 0)
+
+    def test_bulk_create_endpoint_many_to_many(self):
+        parent = TestModel.objects.create(name="parent", age=40)
+        tag = TagTestModel.objects.create(name="tag")
+        url = reverse("restadmin:admin_RelatedTestModel-bulk")
+        response = self.client.post(url, data=[{"name": "one", "parent": parent.id, "tags": [tag.id]}], format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(RelatedTestModel.objects.get().tags.all()), [tag])
+
+    def test_bulk_max_batch_size(self):
+        url = reverse("restadmin:admin_TestModel-bulk")
+        viewset = site.get_registry()[TestModel]
+        viewset.bulk_max_batch_size = 1
+        try:
+            response = self.client.post(url, data=[{"name": "a", "age": 1}, {"name": "b", "age": 2}], format="json")
+        finally:
+            viewset.bulk_max_batch_size = RestModelAdmin.bulk_max_batch_size
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TestModel.objects.count(), 0)
+
+    def test_bulk_update_endpoint(self):
+        first = TestModel.objects.create(name="one", age=1)
+        second = TestModel.objects.create(name="two", age=2)
+        url = reverse("restadmin:admin_TestModel-bulk")
+        response = self.client.patch(url, data=[{"id": first.id, "age": 10}, {"id": second.id, "name": "deux"}],
+                                     format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TestModel.objects.get(id=first.id).age, 10)
+        self.assertEqual(TestModel.objects.get(id=second.id).name, "deux")
+
+    def test_bulk_update_endpoint_errors(self):
+        first = TestModel.objects.create(name="one", age=1)
+        url = reverse("restadmin:admin_TestModel-bulk")
+        response = self.client.patch(url, data=[{"id": first.id, "age": 10}, {"id": 999, "age": 3},
+                                                {"id": first.id, "age": "old"}], format="json")
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("id", errors[1])
+        self.assertIn("age", errors[2])
+        self.assertEqual(TestModel.objects.get(id=first.id).age, 1)
+
+    def test_bulk_delete_endpoint(self):
+        objects = [TestModel.objects.create(name=str(i), age=i) for i in range(3)]
+        url = reverse("restadmin:admin_TestModel-bulk")
+        response = self.client.delete(url, data=[objects[0].id, objects[1].id], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"deleted": 2})
+        self.assertEqual(list(TestModel.objects.all()), [objects[2]])
+
+    def test_bulk_delete_endpoint_errors(self):
+        model_object = TestModel.objects.create(name="name", age=1)
+        url = reverse("restadmin:admin_TestModel-bulk")
+        response = self.client.delete(url, data=[model_object.id, 999], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TestModel.objects.count(), 1)
+
+    def test_export_ndjson(self):
+        for i in range(3):
+            TestModel.objects.create(name=str(i), age=i)
+        url = reverse("restadmin:admin_TestModel-export")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["0", "1", "2"])
+
+    def test_export_csv(self):
+        viewset = site.get_registry()[TestModel]
+        viewset.export_chunk_size = 2
+        try:
+            for i in range(3):
+                TestModel.objects.create(name=str(i), age=i)
+            url = reverse("restadmin:admin_TestModel-export")
+            response = self.client.get(url, {"format": "csv"})
+            chunks = list(response.streaming_content)
+        finally:
+            viewset.export_chunk_size = RestModelAdmin.export_chunk_size
+        self.assertEqual(response["Content-Type"], "text/csv")
+        # The header goes out first, then a chunk at a time
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual([(row["name"], row["age"]) for row in rows], [("0", "0"), ("1", "1"), ("2", "2")])
+
+    def test_export_many_to_many_csv(self):
+        parent = TestModel.objects.create(name="parent", age=40)
+        related = RelatedTestModel.objects.create(name="related", parent=parent)
+        related.tags.set([TagTestModel.objects.create(name="tag")])
+        url = reverse("restadmin:admin_RelatedTestModel-export")
+        response = self.client.get(url, HTTP_ACCEPT="text/csv")
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(json.loads(rows[0]["tags"]), [related.tags.get().id])
+
+    def test_import_ndjson(self):
+        existing = TestModel.objects.create(name="old", age=1)
+        body = "\n".join([
+            json.dumps({"id": existing.id, "name": "new", "age": 2}),
+            json.dumps({"name": "created", "age": 3}),
+            json.dumps({"name": "no age"}),
+            "{not json",
+            "",
+        ])
+        url = reverse("restadmin:admin_TestModel-import")
+        response = self.client.post(url, data=body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result["processed"], result["created"], result["updated"], result["failed"]), (4, 1, 1, 2))
+        self.assertEqual([error["row"] for error in result["errors"]], [3, 4])
+        self.assertEqual(TestModel.objects.get(id=existing.id).name, "new")
+        self.assertTrue(TestModel.objects.filter(name="created", age=3).exists())
+
+    def test_import_without_content_length(self):
+        request = APIRequestFactory().post("/", data=b'{"name": "chunked", "age": 1}\n',
+                                           content_type="application/x-ndjson")
+        # A chunked upload has no Content-Length
+        del request.META["CONTENT_LENGTH"]
+        force_authenticate(request, self.superuser)
+        response = site.get_registry()[TestModel].as_view({"post": "import_rows"})(request)
+        self.assertEqual(response.data["created"], 1)
+        self.assertTrue(TestModel.objects.filter(name="chunked").exists())
+
+        response = self.client.post(reverse("restadmin:admin_TestModel-import"), data=b"",
+                                    content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_invalid_bytes_and_keys(self):
+        url = reverse("restadmin:admin_TestModel-import")
+        body = b'{"name": "ok", "age": 1}\n{"name": "\xff", "age": 2}\n{"id": "abc", "name": "bad id", "age": 3}\n'
+        response = self.client.post(url, data=body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result["created"], result["failed"]), (1, 2))
+        self.assertEqual([error["row"] for error in result["errors"]], [2, 3])
+        self.assertIn("id", result["errors"][1]["errors"])
+
+        body = b'name,age\n"caf\xe9",1\nvalid,2\n'
+        response = self.client.post(url, data=body, content_type="text/csv")
+        result = response.json()
+        self.assertEqual((result["created"], result["failed"]), (1, 1))
+        self.assertEqual(result["errors"][0]["row"], 1)
+        self.assertEqual(sorted(TestModel.objects.values_list("name", flat=True)), ["ok", "valid"])
+
+        response = self.client.post(url, data=b"n\xe4me,age\nvalid,2\n", content_type="text/csv")
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_csv_in_batches(self):
+        viewset = site.get_registry()[TestModel]
+        viewset.import_batch_size = 2
+        try:
+            body = "id,name,age\n10,a,1\n11,b,2\n,c,3\n"
+            url = reverse("restadmin:admin_TestModel-import")
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data=body, content_type="text/csv")
+        finally:
+            viewset.import_batch_size = RestModelAdmin.import_batch_size
+        self.assertEqual(response.json()["created"], 3)
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("INSERT")]), 2)
+        self.assertEqual(sorted(TestModel.objects.values_list("name", flat=True)), ["a", "b", "c"])
+        # Primary keys are kept
+        self.assertEqual(TestModel.objects.get(name="a").id, 10)
+
+    def test_export_import_round_trip(self):
+        parent = TestModel.objects.create(name="parent", age=40)
+        related = RelatedTestModel.objects.create(name="related", parent=parent)
+        related.tags.set([TagTestModel.objects.create(name="tag")])
+        response = self.client.get(reverse("restadmin:admin_RelatedTestModel-export"), {"format": "csv"})
+        body = b"".join(response.streaming_content)
+        RelatedTestModel.objects.all().delete()
+
+        response = self.client.post(reverse("restadmin:admin_RelatedTestModel-import"), data=body,
+                                    content_type="text/csv")
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual(RelatedTestModel.objects.get(id=related.id).tags.count(), 1)
+
+    def test_import_duplicated_primary_key(self):
+        body = "\n".join(json.dumps({"id": 5, "name": "a", "age": 1}) for _ in range(2))
+        response = self.client.post(reverse("restadmin:admin_TestModel-import"), data=body,
+                                    content_type="application/x-ndjson")
+        self.assertEqual(response.json()["failed"], 2)
+        self.assertEqual(TestModel.objects.count(), 0)
+
+    def test_list_etag_without_query(self):
+        TimestampedTestModel.objects.create(name="name", age=1)
+        url = reverse("restadmin:admin_TimestampedTestModel-list")
+        response = self.client.get(url)
+        self.assertTrue(response["ETag"].startswith("W/"))
+        # A delete doesn't change the latest timestamp of the list
+        self.assertNotIn("Last-Modified", response)
+
+        # Session, user and the version query, no rows are fetched
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_etag_without_count(self):
+        site = AdminSite()
+        site.register(TimestampedTestModel, pagination_mode="keyset")
+        TimestampedTestModel.objects.create(name="name", age=1)
+        view = site.get_registry()[TimestampedTestModel].as_view({"get": "list"})
+        factory = APIRequestFactory()
+
+        request = factory.get("/")
+        force_authenticate(request, self.superuser)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+            response.render()
+        self.assertFalse([query for query in queries if "COUNT(" in query["sql"].upper()])
+        # Hash of the body
+        self.assertFalse(response["ETag"].startswith("W/"))
+
+        request = factory.get("/", HTTP_IF_NONE_MATCH=response["ETag"])
+        force_authenticate(request, self.superuser)
+        self.assertEqual(view(request).status_code, 304)
+
+    def test_list_etag_changes_on_write(self):
+        model_object = TimestampedTestModel.objects.create(name="name", age=1)
+        url = reverse("restadmin:admin_TimestampedTestModel-list")
+        etag = self.client.get(url)["ETag"]
+        model_object.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        etag = response["ETag"]
+        TimestampedTestModel.objects.create(name="other", age=2)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        model_object.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_retrieve_last_modified(self):
+        model_object = TimestampedTestModel.objects.create(name="name", age=1)
+        url = reverse("restadmin:admin_TimestampedTestModel-detail", args=(model_object.id,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=self.client.get(url)["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_retrieve_etag_missing_object(self):
+        url = reverse("restadmin:admin_TimestampedTestModel-detail", args=(1,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_etag_from_body(self):
+        model_object = TestModel.objects.create(name="name", age=1)
+        url = reverse("restadmin:admin_TestModel-detail", args=(model_object.id,))
+        response = self.client.get(url)
+        self.assertFalse(response["ETag"].startswith("W/"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        model_object.age = 2
+        model_object.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+    def test_sparse_fields_list(self):
+        TestModel.objects.create(name="name", age=1)
+        url = reverse("restadmin:admin_TestModel-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"fields": "name"})
+        self.assertEqual(response.json(), [{"name": "name"}])
+        select = [query["sql"] for query in queries if "tests_testmodel" in query["sql"]][-1]
+        self.assertNotIn('"age"', select)
+
+    def test_sparse_fields_exclude(self):
+        model_object = TestModel.objects.create(name="name", age=1)
+        url = reverse("restadmin:admin_TestModel-detail", args=(model_object.id,))
+        response = self.client.get(url, {"exclude": "name,age"})
+        self.assertEqual(response.json(), {"id": model_object.id})
+
+    def test_sparse_fields_skip_relations(self):
+        parent = TestModel.objects.create(name="parent", age=40)
+        related = RelatedTestModel.objects.create(name="related", parent=parent)
+        related.tags.set([TagTestModel.objects.create(name="tag")])
+        url = reverse("restadmin:admin_RelatedTestModel-list")
+        # Session, user and the rows, the tags aren't prefetched
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"fields": "id,parent"})
+        self.assertEqual(response.json(), [{"id": related.id, "parent": parent.id}])
+
+    def test_sparse_fields_unknown_field(self):
+        url = reverse("restadmin:admin_TestModel-list")
+        response = self.client.get(url, {"fields": "name,unknown"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("unknown", response.json()["fields"][0])
+
+    def test_sparse_fields_ignored_on_writes(self):
+        url = reverse("restadmin:admin_TestModel-list")
+        response = self.client.post(f"{url}?fields=name", data={"name": "name", "age": 16})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("age", response.json())
+    def test_list_fields_auto(self):
+        document = DocumentTestModel.objects.create(name="name", body="long text", data={"key": "value"})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("restadmin:admin_DocumentTestModel-list"))
+        self.assertEqual(response.json(), [{"id": document.id, "name": "name"}])
+        select = [query["sql"] for query in queries if "tests_documenttestmodel" in query["sql"]][-1]
+        self.assertNotIn('"body"', select)
+
+        response = self.client.get(reverse("restadmin:admin_DocumentTestModel-detail", args=(document.id,)))
+        self.assertEqual(response.json()["body"], "long text")
+
+    def test_list_fields_explicit_selection(self):
+        DocumentTestModel.objects.create(name="name", body="long text")
+        response = self.client.get(reverse("restadmin:admin_DocumentTestModel-list"), {"fields": "body"})
+        self.assertEqual(response.json(), [{"body": "long text"}])
+
+class TestResponseCache(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.site = AdminSite()
+        self.site.register(TestModel, cache_timeout=60)
+        self.viewset = self.site.get_registry()[TestModel]
+
+    def tearDown(self):
+        self.site.unregister(TestModel)
+
+    def get(self, actions, user=None, **kwargs):
+        return self.call_view(self.viewset, actions, self.factory.get("/"), user, **kwargs)
+
+    def test_list_served_from_cache(self):
+        TestModel.objects.create(name="name", age=1)
+        first = self.get({"get": "list"})
+        with self.assertNumQueries(0):
+            second = self.get({"get": "list"})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_retrieve_served_from_cache(self):
+        model_object = TestModel.objects.create(name="name", age=1)
+        self.get({"get": "retrieve"}, pk=model_object.pk)
+        with self.assertNumQueries(0):
+            response = self.get({"get": "retrieve"}, pk=model_object.pk)
+        self.assertEqual(json.loads(response.content)["name"], "name")
+
+    def test_retrieve_from_cache_checks_object_permissions(self):
+        class MinorsOnly(IsAdminUser):
+            def has_object_permission(self, request, view, obj):
+                return obj.age < 18
+
+        model_object = TestModel.objects.create(name="name", age=1)
+        self.viewset.permission_classes = [MinorsOnly]
+        self.addCleanup(setattr, self.viewset, "permission_classes", [IsAdminUser])
+        self.assertEqual(self.get({"get": "retrieve"}, pk=model_object.pk).status_code, 200)
+        # QuerySet.update() doesn't invalidate the cache
+        TestModel.objects.filter(pk=model_object.pk).update(age=30)
+        self.assertEqual(self.get({"get": "retrieve"}, pk=model_object.pk).status_code, 403)
+
+    def test_cache_scoped_per_user(self):
+        TestModel.objects.create(name="name", age=1)
+        self.get({"get": "list"})
+        other = User.objects.create_superuser(username="other", password="secret", email="other@example.com")
+        with self.assertNumQueries(1):
+            self.get({"get": "list"}, user=other)
+
+    def test_signals_invalidate_cache(self):
+        model_object = TestModel.objects.create(name="name", age=1)
+        self.get({"get": "list"})
+        model_object.name = "renamed"
+        model_object.save()
+        response = self.get({"get": "list"})
+        self.assertEqual(json.loads(response.content)[0]["name"], "renamed")
+
+        model_object.delete()
+        self.assertEqual(json.loads(self.get({"get": "list"}).content), [])
+
+    def test_bulk_writes_invalidate_cache(self):
+        self.get({"get": "list"})
+        self.call_view(self.viewset, {"post": "bulk"},
+                       self.factory.post("/", [{"name": "name", "age": 1}], format="json"))
+        self.assertEqual(len(json.loads(self.get({"get": "list"}).content)), 1)
+
+    def test_unregister_disconnects_signals(self):
+        self.site.unregister(TestModel)
+        self.assertFalse(post_save.has_listeners(TestModel))
+        self.site.register(TestModel, cache_timeout=60)
+
+
+class TestEstimatedCountPagination(APITestCase):
+    def setUp(self):
+        for i in range(5):
+            TestModel.objects.create(name=str(i), age=i)
+        self.queryset = TestModel.objects.order_by("id")
+
+    def test_exact_count_fallback(self):
+        # SQLite has no estimate
+        paginator = EstimatedCountPaginator(self.queryset, 2)
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.count_estimated)
+
+    def test_estimated_count(self):
+        with mock.patch("restadmin.pagination.estimate_count", return_value=3):
+            paginator = EstimatedCountPaginator(self.queryset, 2)
+            with self.assertNumQueries(2):
+                self.assertEqual(paginator.count, 3)
+                # Past the estimated end there are still rows
+                page = paginator.page(2)
+                self.assertTrue(page.has_next())
+                last_page = paginator.page(3)
+        self.assertTrue(paginator.count_estimated)
+        self.assertFalse(last_page.has_next())
+        self.assertEqual([row.name for row in last_page], ["4"])
+
+    def test_paginated_response(self):
+        request = Request(APIRequestFactory().get("/", {"page": 2, "page_size": 2}))
+        pagination = EstimatedCountPagination()
+        with mock.patch("restadmin.pagination.estimate_count", return_value=200000):
+            rows = pagination.paginate_queryset(self.queryset, request)
+            response = pagination.get_paginated_response([row.name for row in rows])
+        self.assertEqual(response.data["count"], 200000)
+        self.assertTrue(response.data["count_estimated"])
+        self.assertEqual(response.data["results"], ["2", "3"])
+
+    def test_filtered_queryset_not_estimated(self):
+        self.assertIsNone(estimate_count(self.queryset.filter(age__gt=1), 0))
+
+
+class TestInstrumentation(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = AdminSite()
+        parent = TestModel.objects.create(name="parent", age=1)
+        for i in range(3):
+            RelatedTestModel.objects.create(name=str(i), parent=parent)
+
+    def get(self, viewset, actions, **kwargs):
+        return self.call_view(viewset, actions, self.factory.get("/"), **kwargs)
+
+    def test_server_timing_header(self):
+        self.site.register(TestModel)
+        response = self.get(self.site.get_registry()[TestModel], {"get": "list"})
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response["Server-Timing"],
+                         r'^db;dur=[\d.]+;desc="1 queries", serialize;dur=[\d.]+, render;dur=[\d.]+$')
+
+    def test_metrics_hooks(self):
+        calls = []
+        self.site.register(TestModel, metrics_hooks=[lambda request, metrics: calls.append(metrics)])
+        self.get(self.site.get_registry()[TestModel], {"get": "list"})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["queries"], 1)
+        self.assertEqual(calls[0]["action"], "list")
+        self.assertEqual(calls[0]["status"], 200)
+        self.assertEqual(calls[0]["viewset"], "TestModelViewSet")
+
+    def test_failing_metrics_hook_ignored(self):
+        def hook(request, metrics):
+            raise RuntimeError("metrics backend down")
+
+        self.site.register(TestModel, metrics_hooks=[hook])
+        with self.assertLogs("restadmin", level="ERROR"):
+            response = self.get(self.site.get_registry()[TestModel], {"get": "list"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_budget_logged(self):
+        # Without the planned queryset every row loads its parent
+        self.site.register(RelatedTestModel, NestedParentSerializer, optimize_queryset=False, query_budget=2)
+        with self.assertLogs("restadmin", level="WARNING") as logs:
+            response = self.get(self.site.get_registry()[RelatedTestModel], {"get": "list"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("over the budget of 2", logs.output[0])
+
+    @override_settings(RESTADMIN_QUERY_BUDGET_ACTION="raise")
+    def test_query_budget_raises(self):
+        self.site.register(RelatedTestModel, NestedParentSerializer, optimize_queryset=False, query_budget=2)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.get(self.site.get_registry()[RelatedTestModel], {"get": "list"})
+
+    @override_settings(RESTADMIN_QUERY_BUDGET_ACTION="raise")
+    def test_query_budget_met_by_planned_queryset(self):
+        self.site.register(RelatedTestModel, NestedParentSerializer, query_budget=2)
+        response = self.get(self.site.get_registry()[RelatedTestModel], {"get": "list"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_budget_on_restmodeladmin(self):
+        viewset = type("BudgetRestModelAdmin", (RestModelAdmin,), {
+            "serializer_class": NestedParentSerializer, "optimize_queryset": False})
+        self.site.register(RelatedTestModel, viewset, query_budget=1)
+        self.site.warmup()
+        self.assertEqual(viewset.query_budget, 1)
+
+    def test_nplusone_detected(self):
+        self.site.register(RelatedTestModel, NestedParentSerializer, optimize_queryset=False)
+        viewset = self.site.get_registry()[RelatedTestModel]
+        response = self.call_view(viewset, {"get": "list"}, self.factory.get("/"),
+                                  initkwargs={"detect_nplusone": "record"})
+        findings = response.renderer_context["view"].nplusone_findings
+        self.assertEqual({finding["field"] for finding in findings}, {"parent", "tags"})
+        by_field = {finding["field"]: finding for finding in findings}
+        self.assertEqual(by_field["parent"]["queries"], 3)
+        self.assertEqual(by_field["parent"]["suggestion"], ['select_related("parent")'])
+        self.assertEqual(by_field["tags"]["suggestion"], ['prefetch_related("tags")'])
+
+    def test_nplusone_raises(self):
+        self.site.register(RelatedTestModel, NestedParentSerializer, optimize_queryset=False)
+        viewset = self.site.get_registry()[RelatedTestModel]
+        with self.assertRaisesMessage(NPlusOneDetected, 'Add select_related("parent")'):
+            self.call_view(viewset, {"get": "list"}, self.factory.get("/"), initkwargs={"detect_nplusone": "raise"})
+
+    @override_settings(RESTADMIN_DETECT_NPLUSONE="log")
+    def test_nplusone_logged(self):
+        self.site.register(RelatedTestModel, NestedParentSerializer, optimize_queryset=False)
+        with self.assertLogs("restadmin", level="WARNING") as logs:
+            self.get(self.site.get_registry()[RelatedTestModel], {"get": "list"})
+        self.assertTrue(any("the field parent" in line for line in logs.output))
+
+    def test_audit_site(self):
+        self.site.register(TestModel)
+        self.site.register(RelatedTestModel, NestedParentSerializer, optimize_queryset=False)
+        TestModel.objects.create(name="other", age=2)
+        report = audit_site(self.site, self.superuser)
+        self.assertEqual(list(report), [RelatedTestModel])
+
+    def test_audit_site_planned_queryset(self):
+        self.site.register(RelatedTestModel, NestedParentSerializer)
+        self.assertEqual(audit_site(self.site, self.superuser), {})
+
+    def test_audit_site_forbidden(self):
+        self.site.register(TestModel)
+        with self.assertRaises(AssertionError):
+            audit_site(self.site)
+
+
+class TestFastSerialization(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = AdminSite()
+        parent = TestModel.objects.create(name="parent", age=1)
+        for i in range(4):
+            PricedTestModel.objects.create(name=f"item {i}", parent=parent if i % 2 else None, price=f"{i}.50",
+                                           released=datetime.date(2020, 1, i + 1) if i % 2 else None)
+            TimestampedTestModel.objects.create(name=str(i), age=i)
+            DocumentTestModel.objects.create(name=str(i), body="text", data={"key": [i]})
+
+    def get(self, model, actions, fast, params=None, **kwargs):
+        response = self.call_view(self.site.get_registry()[model], actions, self.factory.get("/", params or {}),
+                                  initkwargs={"fast_serialization": fast}, **kwargs)
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def assertSameOutput(self, model, actions=None, params=None):
+        actions = actions or {"get": "list"}
+        with mock.patch.object(model, "from_db") as from_db:
+            fast = self.get(model, actions, True, params)
+        from_db.assert_not_called()
+        self.assertEqual(fast, self.get(model, actions, False, params))
+        return fast
+
+    def test_list_same_output(self):
+        self.site.register(PricedTestModel)
+        self.site.register(TimestampedTestModel)
+        content = self.assertSameOutput(PricedTestModel)
+        self.assertIn(b'"price":"1.50"', content)
+        self.assertIn(b'"released":null', content)
+        self.assertSameOutput(TimestampedTestModel)
+
+    def test_paginated_list_same_output(self):
+        self.site.register(PricedTestModel, pagination_class=LargeResultsSetPagination)
+        self.site.register(TimestampedTestModel, pagination_mode="keyset")
+        self.assertSameOutput(PricedTestModel, params={"page_size": 2, "page": 2})
+        self.assertSameOutput(TimestampedTestModel, params={"page_size": 2})
+
+    def test_sparse_list_same_output(self):
+        self.site.register(PricedTestModel)
+        self.site.register(DocumentTestModel, list_fields="auto")
+        self.assertSameOutput(PricedTestModel, params={"fields": "id,price"})
+        self.assertSameOutput(DocumentTestModel)
+
+    def test_export_same_output(self):
+        self.site.register(PricedTestModel)
+        self.assertSameOutput(PricedTestModel, {"get": "export"})
+        self.assertSameOutput(PricedTestModel, {"get": "export"}, {"format": "csv"})
+
+    def test_json_fields_same_output(self):
+        # JSONField reads its column like any other field, values() decodes it
+        self.site.register(DocumentTestModel, list_fields=["id", "name", "data"])
+        content = self.assertSameOutput(DocumentTestModel)
+        self.assertIn(b'"data":{"key":[0]}', content)
+
+    def test_fields_needing_instances_use_serializer(self):
+        # BinaryField (a ModelField) is rendered from the instance, as are many to many fields
+        self.site.register(DocumentTestModel)
+        self.site.register(RelatedTestModel)
+        for model in (DocumentTestModel, RelatedTestModel):
+            viewset = self.site.get_registry()[model](request=None, format_kwarg=None, action="list")
+            self.assertIsNone(viewset.get_values_representation())
+
+    def test_values_list_mode(self):
+        self.site.register(PricedTestModel, list_mode="values")
+        with mock.patch.object(PricedTestModel, "from_db") as from_db:
+            content = self.get(PricedTestModel, {"get": "list"}, True)
+        from_db.assert_not_called()
+        rows = json.loads(content)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(list(rows[1]), ["id", "name", "price", "released", "parent"])
+        self.assertEqual(rows[1]["parent"], TestModel.objects.get().pk)
+        self.assertEqual(rows[1]["released"], "2020-01-02")
+        # Values are encoded as they are, decimals aren't formatted as strings by the serializer field
+        self.assertEqual(rows[1]["price"], 1.5)
+
+    def test_values_list_mode_sparse_fields(self):
+        self.site.register(PricedTestModel, list_mode="values", pagination_mode="keyset")
+        rows = json.loads(self.get(PricedTestModel, {"get": "list"}, True, {"fields": "name"}))["results"]
+        self.assertEqual(rows[0], {"name": "item 3"})
+
+    def test_values_list_mode_custom_serializer(self):
+        self.site.register(RelatedTestModel, NestedParentSerializer, list_mode="values", optimize_queryset=False,
+                           list_fields=["id", "name"])
+        related = RelatedTestModel.objects.create(name="related", parent=TestModel.objects.get())
+        self.assertEqual(json.loads(self.get(RelatedTestModel, {"get": "list"}, True)),
+                         [{"id": related.pk, "name": "related"}])
+
+    def test_values_list_mode_unsupported_fields(self):
+        self.site.register(RelatedTestModel, list_mode="values")
+        with self.assertRaisesMessage(ImproperlyConfigured, "not tags"):
+            self.site.warmup()
+        self.assertFalse(self.site.is_registered(RelatedTestModel))
+        with self.assertRaises(ImproperlyConfigured):
+            self.site.register(RelatedTestModel, list_mode="rows")
+
+    def test_custom_serializer_uses_serializer(self):
+        self.site.register(TestModel, AdminSerializer)
+        viewset = self.site.get_registry()[TestModel](request=None, format_kwarg=None, action="list")
+        self.assertIsNone(viewset.get_values_representation())
+
+
+class NoResultsFilter(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        return queryset.none()
+
+
+class TestFiltering(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = AdminSite()
+        self.parents = [TestModel.objects.create(name=f"parent {i}", age=i) for i in range(3)]
+        for i in range(6):
+            PricedTestModel.objects.create(name=f"item {i}", parent=self.parents[i % 3] if i < 5 else None,
+                                           price=i)
+
+    def get(self, model, params):
+        return self.call_view(self.site.get_registry()[model], {"get": "list"}, self.factory.get("/", params))
+
+    def names(self, model, params):
+        response = self.get(model, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.data["results"] if isinstance(response.data, dict) else response.data
+        return [row["name"] for row in data]
+
+    def test_filter_indexed_fields(self):
+        self.site.register(PricedTestModel)
+        parent = self.parents[1].pk
+        self.assertEqual(self.names(PricedTestModel, {"parent": parent}), ["item 1", "item 4"])
+        self.assertEqual(self.names(PricedTestModel, {"parent__in": f"{parent},{self.parents[2].pk}"}),
+                         ["item 1", "item 2", "item 4"])
+        self.assertEqual(self.names(PricedTestModel, {"parent__isnull": "true"}), ["item 5"])
+        first = PricedTestModel.objects.first().pk
+        self.assertEqual(self.names(PricedTestModel, {"id__gte": first + 4}), ["item 4", "item 5"])
+
+    def test_unindexed_fields_rejected(self):
+        self.site.register(PricedTestModel)
+        response = self.get(PricedTestModel, {"price__gt": 2})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("price__gt", response.data)
+        self.assertEqual(self.get(PricedTestModel, {"parent__contains": 1}).status_code, 400)
+        self.assertEqual(self.get(PricedTestModel, {"parent": "abc"}).status_code, 400)
+        self.assertEqual(self.get(PricedTestModel, {"parent__isnull": "maybe"}).status_code, 400)
+
+    def test_reserved_params(self):
+        self.site.register(ReservedNamesTestModel, pagination_class=LargeResultsSetPagination,
+                           filter_fields=["page", "format"])
+        ReservedNamesTestModel.objects.create(name="first", page=1, format="csv", ordering=2)
+        ReservedNamesTestModel.objects.create(name="second", page=2, format="json", ordering=1)
+        self.assertEqual(self.names(ReservedNamesTestModel, {"page": 1, "format": "json", "page_size": 10}),
+                         ["first", "second"])
+        self.assertEqual(self.names(ReservedNamesTestModel, {"page__exact": 2, "format__exact": "json"}),
+                         ["second"])
+        self.assertEqual(self.names(ReservedNamesTestModel, {"ordering": "-id", "fields": "name"}),
+                         ["second", "first"])
+
+    def test_default_filter_backends_follow_settings(self):
+        self.site.register(PricedTestModel)
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                               "DEFAULT_FILTER_BACKENDS": ["tests.tests.NoResultsFilter"]}):
+            self.assertEqual(self.names(PricedTestModel, {}), [])
+        self.assertEqual(len(self.names(PricedTestModel, {})), 6)
+
+    def test_explicit_filter_fields(self):
+        self.site.register(PricedTestModel, filter_fields={"price": ["gte", "lt"]})
+        self.assertEqual(self.names(PricedTestModel, {"price__gte": 4}), ["item 4", "item 5"])
+        self.assertEqual(self.get(PricedTestModel, {"price": 4}).status_code, 400)
+        self.assertEqual(self.get(PricedTestModel, {"parent": 1}).status_code, 400)
+
+    def test_ordering(self):
+        self.site.register(TestModel, ordering_fields=["age"])
+        self.site.register(PricedTestModel)
+        self.assertEqual(self.names(TestModel, {"ordering": "-age"}), ["parent 2", "parent 1", "parent 0"])
+        self.assertEqual(self.names(PricedTestModel, {"ordering": "-id"})[0], "item 5")
+        response = self.get(PricedTestModel, {"ordering": "price"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", response.data)
+
+    def test_ordering_keyset_pagination(self):
+        self.site.register(PricedTestModel, pagination_mode="keyset", ordering_fields=["price"])
+        response = self.get(PricedTestModel, {"ordering": "price", "page_size": 4})
+        self.assertEqual([row["name"] for row in response.data["results"]], ["item 0", "item 1", "item 2", "item 3"])
+        cursor = response.data["next"].split("cursor=")[1].split("&")[0]
+        response = self.get(PricedTestModel, {"ordering": "price", "page_size": 4, "cursor": cursor})
+        self.assertEqual([row["name"] for row in response.data["results"]], ["item 4", "item 5"])
+        # Without a parameter the paginator ordering applies
+        self.assertEqual(self.names(PricedTestModel, {})[0], "item 5")
+
+    def test_search(self):
+        self.site.register(TestModel, search_fields=["name"])
+        self.assertEqual(self.names(TestModel, {"search": "parent 1"}), ["parent 1"])
+
+    def test_invalid_options(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.site.register(TestModel, filter_fields=["unknown"])
+        with self.assertRaises(ImproperlyConfigured):
+            self.site.register(TestModel, filter_fields={"age": ["contains"]})
+        with self.assertRaises(ImproperlyConfigured):
+            self.site.register(TestModel, ordering_fields=["related"])
+
+
+class TestAggregate(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = AdminSite()
+        self.parents = [TestModel.objects.create(name=f"parent {i}", age=i) for i in range(2)]
+        for i in range(5):
+            PricedTestModel.objects.create(name=f"item {i}", parent=self.parents[i % 2], price=i + 1,
+                                           released=datetime.date(2024, 1, i + 1))
+
+    def get(self, params, user=None):
+        return self.call_view(self.site.get_registry()[PricedTestModel], {"get": "aggregate"},
+                              self.factory.get("/", params), user)
+
+    def test_group_by(self):
+        self.site.register(PricedTestModel)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get({"group_by": "parent", "aggregate": "count,price__sum,price__avg,released__max"})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(queries), 1)
+        first, second = self.parents
+        self.assertEqual(json.loads(response.content), [
+            {"parent": first.pk, "count": 3, "price__sum": 9.0, "price__avg": 3.0, "released__max": "2024-01-05"},
+            {"parent": second.pk, "count": 2, "price__sum": 6.0, "price__avg": 3.0, "released__max": "2024-01-04"},
+        ])
+
+    def test_totals_with_filters(self):
+        self.site.register(PricedTestModel)
+        response = self.get({})
+        self.assertEqual(response.data, [{"count": 5}])
+        response = self.get({"parent": self.parents[1].pk, "aggregate": "count,price__min", "ordering": "-id"})
+        self.assertEqual(response.data, [{"count": 2, "price__min": 2}])
+
+    def test_whitelists(self):
+        self.site.register(PricedTestModel, group_by_fields=["released"], aggregate_fields=["price"])
+        self.assertEqual(self.get({"group_by": "parent"}).status_code, 400)
+        self.assertEqual(self.get({"group_by": "name"}).status_code, 400)
+        self.assertEqual(self.get({"aggregate": "released__max"}).status_code, 400)
+        self.assertEqual(self.get({"aggregate": "price__median"}).status_code, 400)
+        self.assertEqual(len(self.get({"group_by": "released", "aggregate": "price__sum"}).data), 5)
+        with self.assertRaises(ImproperlyConfigured):
+            AdminSite().register(PricedTestModel, group_by_fields=["missing"])
+
+    def test_sum_of_numbers_only(self):
+        self.site.register(PricedTestModel, aggregate_fields=["name", "released"])
+        self.assertEqual(self.get({"aggregate": "released__sum"}).status_code, 400)
+        self.assertEqual(self.get({"aggregate": "name__max"}).data, [{"name__max": "item 4"}])
+
+    def test_max_groups(self):
+        self.site.register(PricedTestModel)
+        self.site.get_registry()[PricedTestModel].aggregate_max_groups = 4
+        self.assertEqual(self.get({"group_by": "id"}).status_code, 400)
+        self.assertEqual(self.get({"group_by": "parent"}).status_code, 200)
+
+    def test_permissions(self):
+        self.site.register(PricedTestModel)
+        user = User.objects.create_user(username="user", password="secret")
+        self.assertEqual(self.get({}, user=user).status_code, 403)
+
+
+@override_settings(ROOT_URLCONF="tests.tests")
+class TestSchemaCache(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.superuser)
+        self.site = AdminSite()
+        self.site.register(TestModel)
+
+    def test_generated_once_per_registry_state(self):
+        schema_cache = self.site.schema_cache
+        with mock.patch.object(schema_cache, "generate", wraps=schema_cache.generate) as generate:
+            document, fingerprint = schema_cache.get("coreapi")
+            self.assertEqual(schema_cache.get("coreapi"), (document, fingerprint))
+            self.assertEqual(generate.call_count, 1)
+
+            self.site.register(TimestampedTestModel)
+            updated, updated_fingerprint = schema_cache.get("coreapi")
+            self.assertEqual(generate.call_count, 2)
+        self.assertNotEqual(fingerprint, updated_fingerprint)
+        self.assertIn("TimestampedTestModel", json.dumps(updated.data, default=str))
+
+        self.site.unregister(TimestampedTestModel)
+        self.assertEqual(schema_cache.get_fingerprint(), fingerprint)
+
+    def test_openapi_schema(self):
+        schema, _fingerprint = self.site.schema_cache.get("openapi")
+        self.assertIn("/tests/TestModel/", schema["paths"])
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.site.schema_cache.cache_dir = cache_dir
+            document, fingerprint = self.site.schema_cache.get("coreapi")
+            openapi_schema, _fingerprint = self.site.schema_cache.get("openapi")
+
+            other_process = SchemaCache(self.site, title=self.site.schema_cache.title, cache_dir=cache_dir)
+            with mock.patch.object(other_process, "generate") as generate:
+                self.assertEqual(other_process.get("coreapi"), (document, fingerprint))
+                self.assertEqual(other_process.get("openapi")[0], openapi_schema)
+            generate.assert_not_called()
+
+    def test_docs_etag(self):
+        docs_url = reverse("api-docs:docs-index")
+        response = self.client.get(docs_url, HTTP_ACCEPT="application/coreapi+json")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(docs_url, HTTP_ACCEPT="application/coreapi+json",
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse("api-docs:openapi"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("openapi", response.json())
+
+    def test_docs_staff_only(self):
+        self.client.logout()
+        response = self.client.get(reverse("api-docs:openapi"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            output = io.StringIO()
+            call_command("restadmin_schema", cache_dir=cache_dir, site="tests.tests.site", stdout=output)
+            paths = output.getvalue().split()
+            self.assertEqual(len(paths), 2)
+            self.assertTrue(all(os.path.exists(file_path) for file_path in paths))
+        with self.assertRaises(CommandError):
+            call_command("restadmin_schema", site="tests.tests.site")
+
+
+class TestReadReplica(AdminViewTestMixin, APITransactionTestCase):
+    # The replica is another connection to the test database, it only sees committed rows
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        super().setUp()
+        self.instance = TestModel.objects.create(name="name", age=1)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def call(self, site, method, actions, data=None, user=None, **kwargs):
+        request = getattr(self.factory, method)("/", data, format="json")
+        response = self.call_view(site.get_registry()[TestModel], actions, request, user, **kwargs)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def queries(self, alias, *args, **kwargs):
+        with CaptureQueriesContext(connections[alias]) as queries:
+            response = self.call(*args, **kwargs)
+        self.assertLess(response.status_code, 400, getattr(response, "data", None))
+        return len(queries)
+
+    def test_reads_on_replica(self):
+        site = AdminSite()
+        site.register(TestModel, read_using="replica")
+        self.assertGreater(self.queries("replica", site, "get", {"get": "list"}), 0)
+        self.assertGreater(self.queries("replica", site, "get", {"get": "retrieve"}, pk=self.instance.pk), 0)
+        # The export streams its rows from the replica
+        self.assertGreater(self.queries("replica", site, "get", {"get": "export"}), 0)
+        self.assertEqual(self.queries("default", site, "get", {"get": "list"}), 0)
+
+    def test_writes_on_default_and_sticky_reads(self):
+        site = AdminSite(read_using="replica")
+        site.register(TestModel)
+        self.assertEqual(self.queries("replica", site, "patch", {"patch": "partial_update"}, {"age": 2},
+                                      pk=self.instance.pk), 0)
+        # The writer reads its own writes from default
+        self.assertEqual(self.queries("replica", site, "get", {"get": "list"}), 0)
+        other = User.objects.create_superuser(username="other", password="secret", email="other@example.com")
+        self.assertGreater(self.queries("replica", site, "get", {"get": "list"}, user=other), 0)
+
+        cache.clear()
+        self.assertGreater(self.queries("replica", site, "get", {"get": "list"}), 0)
+
+    def test_unknown_database(self):
+        with self.assertRaises(ImproperlyConfigured):
+            AdminSite().register(TestModel, read_using="missing")
+        with self.assertRaises(ImproperlyConfigured):
+            AdminSite(read_using="missing").register(TestModel)
+
+
+class TestChangeFeed(AdminViewTestMixin, APITransactionTestCase):
+    # The changes are recorded when the writes commit
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(RestModelAdmin, "changes_settle_delay", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.site = AdminSite()
+        self.site.register(TestModel, track_changes=True, bulk_max_batch_size=10)
+        self.site.register(RelatedTestModel, track_changes=True)
+        self.site.warmup()
+        self.addCleanup(self.site.unregister, TestModel)
+        self.addCleanup(self.site.unregister, RelatedTestModel)
+
+    def call(self, method, actions, data=None, model=TestModel, params=None, **kwargs):
+        request = getattr(self.factory, method)("/", data, format="json") if data is not None else \
+            getattr(self.factory, method)("/", params)
+        return self.call_view(self.site.get_registry()[model], actions, request, **kwargs)
+
+    def changes(self, model=TestModel, **params):
+        response = self.call("get", {"get": "changes"}, model=model, params=params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_signal_writes(self):
+        first = TestModel.objects.create(name="first", age=1)
+        second = TestModel.objects.create(name="second", age=2)
+        feed = self.changes()
+        self.assertEqual([(change["action"], change["id"]) for change in feed["changes"]],
+                         [("created", first.pk), ("created", second.pk)])
+        self.assertEqual(feed["changes"][0]["data"]["name"], "first")
+        self.assertFalse(feed["more"])
+
+        first.age = 3
+        first.save()
+        second_pk = second.pk
+        second.delete()
+        feed = self.changes(since=feed["next"])
+        self.assertEqual(json.loads(json.dumps(feed["changes"])), [
+            {"seq": feed["changes"][0]["seq"], "action": "updated", "id": first.pk,
+             "data": {"id": first.pk, "name": "first", "age": 3}},
+            {"seq": feed["next"], "action": "deleted", "id": second_pk},
+        ])
+        self.assertEqual(self.changes(since=feed["next"])["changes"], [])
+
+    def test_latest_change_per_object(self):
+        instance = TestModel.objects.create(name="first", age=1)
+        for age in range(2, 5):
+            instance.age = age
+            instance.save()
+        feed = self.changes()
+        self.assertEqual(len(feed["changes"]), 1)
+        self.assertEqual(feed["changes"][0]["data"]["age"], 4)
+
+        # Deleted before the feed is read, the create is reported as a tombstone
+        gone = TestModel.objects.create(name="gone", age=1)
+        TestModel.objects.filter(pk=gone.pk).delete()
+        feed = self.changes(since=feed["next"])
+        self.assertEqual([(change["action"], change["id"]) for change in feed["changes"]], [("deleted", gone.pk)])
+
+    def test_limit(self):
+        for i in range(5):
+            TestModel.objects.create(name=f"name {i}", age=i)
+        feed = self.changes(limit=2)
+        self.assertEqual(len(feed["changes"]), 2)
+        self.assertTrue(feed["more"])
+        seen = [change["id"] for change in feed["changes"]]
+        while feed["more"]:
+            feed = self.changes(since=feed["next"], limit=2)
+            seen += [change["id"] for change in feed["changes"]]
+        self.assertEqual(seen, list(TestModel.objects.order_by("pk").values_list("pk", flat=True)))
+
+    def test_bulk_and_import_writes(self):
+        response = self.call("post", {"post": "bulk"}, [{"name": "a", "age": 1}, {"name": "b", "age": 2}])
+        self.assertEqual(response.status_code, 201)
+        ids = [item["id"] for item in response.data]
+        feed = self.changes()
+        self.assertEqual([(change["action"], change["id"]) for change in feed["changes"]],
+                         [("created", ids[0]), ("created", ids[1])])
+
+        response = self.call("patch", {"patch": "bulk_update"}, [{"id": ids[0], "age": 5}])
+        self.assertEqual(response.status_code, 200)
+        response = self.call("delete", {"delete": "bulk_destroy"}, [ids[1]])
+        self.assertEqual(response.status_code, 200)
+        feed = self.changes(since=feed["next"])
+        self.assertEqual([(change["action"], change["id"]) for change in feed["changes"]],
+                         [("updated", ids[0]), ("deleted", ids[1])])
+
+        self.call_view(self.site.get_registry()[TestModel], {"post": "import_rows"},
+                       self.factory.post("/", data=b'{"name": "imported", "age": 7}\n',
+                                         content_type="application/x-ndjson"))
+        feed = self.changes(since=feed["next"])
+        self.assertEqual([change["data"]["name"] for change in feed["changes"]], ["imported"])
+
+    def test_many_to_many_changes(self):
+        parent = TestModel.objects.create(name="parent", age=1)
+        related = RelatedTestModel.objects.create(name="related", parent=parent)
+        tag = TagTestModel.objects.create(name="tag")
+        since = self.changes(model=RelatedTestModel)["next"]
+        related.tags.add(tag)
+        feed = self.changes(model=RelatedTestModel, since=since)
+        self.assertEqual([(change["action"], change["data"]["tags"]) for change in feed["changes"]],
+                         [("updated", [tag.pk])])
+        tag.relatedtestmodel_set.remove(related)
+        self.assertEqual(len(self.changes(model=RelatedTestModel, since=feed["next"])["changes"]), 1)
+
+    def test_uncommitted_and_recent_changes(self):
+        from restadmin.models import ChangeLogEntry
+        with transaction.atomic():
+            instance = TestModel.objects.create(name="first", age=1)
+            self.assertFalse(ChangeLogEntry.objects.exists())
+        self.assertEqual(ChangeLogEntry.objects.get().object_id, str(instance.pk))
+
+        with mock.patch.object(RestModelAdmin, "changes_settle_delay", 60):
+            # Held back until no transaction that started before could still commit a lower sequence number
+            feed = self.changes()
+            self.assertEqual((feed["next"], feed["changes"]), (0, []))
+            ChangeLogEntry.objects.update(timestamp=timezone.now() - datetime.timedelta(minutes=2))
+            self.assertEqual([change["id"] for change in self.changes()["changes"]], [instance.pk])
+
+    def test_invalid_cursor(self):
+        response = self.call("get", {"get": "changes"}, params={"since": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("since", response.data)
+        self.assertEqual(self.call("get", {"get": "changes"}, params={"limit": 0}).status_code, 400)
+
+    def test_prune_command(self):
+        from restadmin.models import ChangeLogEntry
+        TestModel.objects.create(name="old", age=1)
+        ChangeLogEntry.objects.update(timestamp=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        TestModel.objects.create(name="new", age=1)
+        call_command("restadmin_prune_changes", days=7, stdout=io.StringIO())
+        self.assertEqual([change["data"]["name"] for change in self.changes()["changes"]], ["new"])
+
+    def test_untracked_models(self):
+        site = AdminSite()
+        site.register(SecondTestModel)
+        SecondTestModel.objects.create(name="name", age=1)
+        response = self.call_view(site.get_registry()[SecondTestModel], {"get": "changes"}, self.factory.get("/"))
+        self.assertEqual(response.status_code, 404)
+
+        self.site.unregister(TestModel)
+        self.site.register(TestModel)
+        self.site.warmup()
+        TestModel.objects.create(name="name", age=1)
+        from restadmin.models import ChangeLogEntry
+        self.assertFalse(ChangeLogEntry.objects.filter(model="tests.testmodel").exists())
+
+
+class SuperuserOnly(IsAdminUser):
+    def has_permission(self, request, view):
+        return request.user.is_superuser
+
+
+@override_settings(ROOT_URLCONF="tests.tests")
+class TestBatch(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.superuser)
+        self.objects = [TestModel.objects.create(name=f"name {i}", age=i) for i in range(3)]
+
+    def batch(self, requests, **data):
+        response = self.client.post(reverse("restadmin:batch"), {"requests": requests, **data}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.json()["responses"]
+
+    def test_batch(self):
+        first = self.objects[0]
+        responses = self.batch([
+            "tests/TestModel/?ordering=-id",
+            {"path": f"tests/TestModel/{first.pk}/"},
+            {"path": "tests/TestModel/", "params": {"fields": "name", "id__in": f"{first.pk},{self.objects[1].pk}"}},
+            "tests/SecondTestModel/",
+        ])
+        self.assertEqual([response["status"] for response in responses], [200, 200, 200, 200])
+        self.assertEqual([row["name"] for row in responses[0]["body"]], ["name 2", "name 1", "name 0"])
+        self.assertEqual(responses[1]["body"], {"id": first.pk, "name": "name 0", "age": 0})
+        self.assertEqual(responses[2]["body"], [{"name": "name 0"}, {"name": "name 1"}])
+        self.assertEqual(responses[3]["body"], [])
+
+    def test_errors_per_request(self):
+        responses = self.batch([
+            "tests/Unknown/",
+            "tests/TestModel/999/",
+            "tests/TestModel/?age__gt=1",
+            "tests/TestModel/export/",
+            "tests/TestModel/",
+        ])
+        # Sub-requests accept JSON only, which the export doesn't render
+        self.assertEqual([response["status"] for response in responses], [404, 404, 400, 406, 200])
+        self.assertIn("age__gt", responses[2]["body"])
+
+    def test_invalid_batch(self):
+        url = reverse("restadmin:batch")
+        self.assertEqual(self.client.post(url, ["tests/TestModel/"], format="json").status_code, 400)
+        response = self.client.post(url, {"requests": [{"path": "tests/TestModel/", "method": "POST"}, 1]},
+                                    format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data["requests"]), 2)
+        response = self.client.post(url, {"requests": ["tests/TestModel/"] * 21}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_permissions(self):
+        staff = User.objects.create_user(username="staff", password="secret", is_staff=True)
+        site = AdminSite()
+        site.register(TestModel, permission_classes=[SuperuserOnly])
+        site.register(SecondTestModel, async_mode=ASYNC_VIEWSETS)
+        SecondTestModel.objects.create(name="second", age=1)
+        view = site.batch_view_class.as_view(site=site)
+
+        request = self.factory.post("/batch/", {"requests": ["tests/TestModel/", "tests/SecondTestModel/"]},
+                                    format="json")
+        force_authenticate(request, staff)
+        response = view(request)
+        self.assertEqual([item["status"] for item in response.data["responses"]], [403, 200])
+        self.assertEqual(response.data["responses"][1]["body"][0]["name"], "second")
+
+        user = User.objects.create_user(username="user", password="secret")
+        request = self.factory.post("/batch/", {"requests": ["tests/SecondTestModel/"]}, format="json")
+        force_authenticate(request, user)
+        self.assertEqual(view(request).status_code, 403)
+
+
+class TestParallelBatch(AdminViewTestMixin, APITransactionTestCase):
+    # The threads use their own connections, they only see committed rows
+    def test_parallel(self):
+        objects = [TestModel.objects.create(name=f"name {i}", age=i) for i in range(4)]
+        site = AdminSite()
+        site.register(TestModel)
+        view = site.batch_view_class.as_view(site=site)
+        request = self.factory.post("/batch/", {
+            "requests": [f"tests/TestModel/{instance.pk}/" for instance in objects], "parallel": True},
+            format="json")
+        force_authenticate(request, self.superuser)
+        response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["body"]["name"] for item in response.data["responses"]],
+                         [instance.name for instance in objects])
+
+
+search_site = AdminSite()
+search_site.register(DocumentTestModel, search_fields=["name", "body"], full_text_search=True)
+
+
+class TestFullTextSearch(AdminViewTestMixin, APITransactionTestCase):
+    # The FTS5 tables are created outside of a transaction, a rolled back savepoint can't drop them
+    def setUp(self):
+        super().setUp()
+        DocumentTestModel.objects.create(name="apple", body="a pie of apple and more apple")
+        DocumentTestModel.objects.create(name="pear", body="apple")
+        DocumentTestModel.objects.create(name="plum", body="nothing to see")
+        clear_index_cache()
+        self.addCleanup(clear_index_cache)
+        self.addCleanup(get_search_backend().drop_index, DocumentTestModel)
+
+    def create_index(self):
+        call_command("restadmin_search_index", site="tests.tests.search_site", stdout=io.StringIO())
+
+    def names(self, params, site=search_site):
+        response = self.call_view(site.get_registry()[DocumentTestModel], {"get": "list"}, self.factory.get("/", params))
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.data["results"] if isinstance(response.data, dict) else response.data
+        return [row["name"] for row in data]
+
+    def test_ranked_search(self):
+        self.create_index()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names({"search": "apple"}), ["apple", "pear"])
+        self.assertTrue(any("MATCH" in query["sql"] for query in queries.captured_queries))
+        self.assertEqual(self.names({"search": "pie apple"}), ["apple"])
+        self.assertEqual(self.names({"search": 'apple" OR "plum'}), [])
+        self.assertEqual(self.names({"search": "apple", "ordering": "-id"}), ["pear", "apple"])
+
+    def test_index_follows_writes(self):
+        self.create_index()
+        document = DocumentTestModel.objects.create(name="cherry", body="cherry pie")
+        self.assertEqual(self.names({"search": "pie"}), ["cherry", "apple"])
+        DocumentTestModel.objects.filter(pk=document.pk).update(body="sour")
+        self.assertEqual(self.names({"search": "sour"}), ["cherry"])
+        document.delete()
+        self.assertEqual(self.names({"search": "sour"}), [])
+
+    def test_fallback_without_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names({"search": "appl"}), ["apple", "pear"])
+        self.assertFalse(any("MATCH" in query["sql"] for query in queries.captured_queries))
+
+    def test_values_list_mode(self):
+        site = AdminSite()
+        site.register(DocumentTestModel, search_fields=["name"], full_text_search=True, list_fields=["id", "name"],
+                      list_mode="values")
+        self.create_index()
+        self.assertEqual(self.names({"search": "plum"}, site=site), ["plum"])
+
+    def test_rebuild_and_drop(self):
+        output = io.StringIO()
+        call_command("restadmin_search_index", site="tests.tests.search_site", stdout=output)
+        call_command("restadmin_search_index", site="tests.tests.search_site", rebuild=True, stdout=output)
+        self.assertEqual([line.split()[0] for line in output.getvalue().splitlines()],
+                         ["Created", "Dropped", "Created"])
+        call_command("restadmin_search_index", site="tests.tests.search_site", drop=True, stdout=output)
+        self.assertEqual(self.names({"search": "appl"}), ["apple", "pear"])
+
+    def test_search_fields_checked(self):
+        with self.assertRaises(ImproperlyConfigured):
+            AdminSite().register(DocumentTestModel, full_text_search=True, search_fields=[])
+        with self.assertRaises(ImproperlyConfigured):
+            AdminSite().register(RelatedTestModel, full_text_search=True, search_fields=["parent__name"])
+
+
+class TestRenderers(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = AdminSite()
+        self.site.register(PricedTestModel, list_mode="values")
+        PricedTestModel.objects.create(name="caf\u00e9 \u2028", price="12.50", released=datetime.date(2024, 1, 2))
+
+    def get(self, accept):
+        return self.call_view(self.site.get_registry()[PricedTestModel], {"get": "list"},
+                              self.factory.get("/", HTTP_ACCEPT=accept))
+
+    @skipUnless(orjson, "orjson is not installed")
+    def test_orjson_output_matches_json_renderer(self):
+        data = {
+            "decimal": decimal.Decimal("1.50"), "uuid": uuid.UUID(int=1), "text": "a\u2028b\u2029c \u00e9",
+            "datetime": datetime.datetime(2024, 1, 2, 3, 4, 5, 678, tzinfo=datetime.timezone.utc),
+            "naive": datetime.datetime(2024, 1, 2, 3, 4, 5), "date": datetime.date(2024, 1, 2),
+            "time": datetime.time(1, 2, 3), "duration": datetime.timedelta(minutes=1), "lazy": _lazy("lazy"),
+            "nested": [{1: None, "big": 2 ** 70}], "float": 1.5,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(data, "application/json; indent=2"),
+                         JSONRenderer().render(data, "application/json; indent=2"))
+        self.assertEqual(json.loads(ORJSONRenderer().render({"float": 1e16})), {"float": 1e16})
+
+        # Strict JSON has no NaN or infinities, orjson writes them as null
+        for value in (float("nan"), float("inf")):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({"nested": [value, None]})
+            self.assertEqual(ORJSONRenderer().render({"nested": [value, None]}), b'{"nested":[null,null]}')
+
+        response = self.get("application/json")
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack(self):
+        response = self.get("application/msgpack")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), json.loads(self.get("application/json").content))
+
+        moment = datetime.datetime(2024, 1, 2, 3, 4, 5, 678, tzinfo=datetime.timezone.utc)
+        content = MessagePackRenderer().render({
+            "datetime": moment, "naive": moment.replace(tzinfo=None), "decimal": decimal.Decimal("1.50"),
+            "uuid": uuid.UUID(int=1), "date": moment.date(), "lazy": _lazy("lazy")})
+        self.assertEqual(msgpack.unpackb(content, timestamp=3), {
+            "datetime": moment, "naive": "2024-01-02T03:04:05.000678", "decimal": 1.5,
+            "uuid": str(uuid.UUID(int=1)), "date": "2024-01-02", "lazy": "lazy"})
+
+    def test_default_renderers(self):
+        renderer_classes = get_renderer_classes()
+        self.assertEqual(RestModelAdmin.renderer_classes, renderer_classes)
+        self.assertEqual(ORJSONRenderer in renderer_classes, orjson is not None)
+        self.assertEqual(renderer_classes[-1] is MessagePackRenderer, msgpack is not None)
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                               "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"]}):
+            self.assertEqual(RestModelAdmin.renderer_classes,
+                             [ORJSONRenderer if orjson else JSONRenderer] + ([MessagePackRenderer] if msgpack else []))
+            self.assertEqual(self.get("text/html").status_code, 406)
+
+
+class AsyncPermission(IsAdminUser):
+    async def has_permission(self, request, view):
+        return request.user.is_superuser
+
+
+@skipUnless(ASYNC_VIEWSETS, "AsyncRestModelAdmin requires Django 4.2")
+class TestAsyncViewSets(AdminViewTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = AdminSite()
+        self.site.register([TestModel, RelatedTestModel], async_mode=True)
+
+    def call(self, model, actions, request, user=None, **kwargs):
+        return self.call_view(self.site.get_registry()[model], actions, request, user, **kwargs)
+
+    def test_list(self):
+        parent = TestModel.objects.create(name="parent", age=40)
+        related = RelatedTestModel.objects.create(name="related", parent=parent)
+        related.tags.set([TagTestModel.objects.create(name="tag")])
+        response = self.call(RelatedTestModel, {"get": "list"}, self.factory.get("/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["tags"], [related.tags.get().id])
+
+    def test_list_full_text_search(self):
+        site = AdminSite()
+        site.register(TestModel, async_mode=True, full_text_search=True, search_fields=["name"])
+        TestModel.objects.create(name="first", age=1)
+        TestModel.objects.create(name="second", age=2)
+        response = self.call_view(site.get_registry()[TestModel], {"get": "list"},
+                                  self.factory.get("/", {"search": "second"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["name"] for row in response.data], ["second"])
+
+    def test_retrieve(self):
+        model_object = TestModel.objects.create(name="name", age=1)
+        response = self.call(TestModel, {"get": "retrieve"}, self.factory.get("/"), pk=model_object.id)
+        self.assertEqual(response.data["name"], "name")
+        response = self.call(TestModel, {"get": "retrieve"}, self.factory.get("/"), pk=999)
+        self.assertEqual(response.status_code, 404)
+
+    def test_create(self):
+        response = self.call(TestModel, {"post": "create"},
+                             self.factory.post("/", {"name": "name", "age": 1}, format="json"))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TestModel.objects.get().name, "name")
+
+    def test_create_many_to_many(self):
+        parent = TestModel.objects.create(name="parent", age=40)
+        tag = TagTestModel.objects.create(name="tag")
+        response = self.call(RelatedTestModel, {"post": "create"}, self.factory.post(
+            "/", {"name": "name", "parent": parent.id, "tags": [tag.id]}, format="json"))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["tags"], [tag.id])
+
+    def test_update_and_destroy(self):
+        model_object = TestModel.objects.create(name="name", age=1)
+        response = self.call(TestModel, {"patch": "partial_update"},
+                             self.factory.patch("/", {"age": 2}, format="json"), pk=model_object.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TestModel.objects.get().age, 2)
+
+        response = self.call(TestModel, {"delete": "destroy"}, self.factory.delete("/"), pk=model_object.id)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(TestModel.objects.exists())
+
+    def test_permission_denied(self):
+        user = User.objects.create_user(username="user", password="secret")
+        response = self.call(TestModel, {"get": "list"}, self.factory.get("/"), user=user)
+        self.assertEqual(response.status_code, 403)
+
+    def test_async_permission(self):
+        self.site.get_registry()[TestModel].permission_classes = [AsyncPermission]
+        staff = User.objects.create_user(username="staff", password="secret", is_staff=True)
+        response = self.call(TestModel, {"get": "list"}, self.factory.get("/"), user=staff)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.call(TestModel, {"get": "list"}, self.factory.get("/")).status_code, 200)
+
+    def test_sync_extra_action(self):
+        response = self.call(TestModel, {"post": "bulk"},
+                             self.factory.post("/", [{"name": "name", "age": 1}], format="json"))
+        self.assertEqual(response.status_code, 201)
@@ -9,15 +9,22 @@ from django.conf import settings
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../restadmin"))
 
 
-def boot_django():
+def boot_django(databases=None, **options):
+    """Configure Django with the settings of the tests, `options` overrides them"""
     settings.configure(
         BASE_DIR=BASE_DIR,
         DEBUG=True,
-        DATABASES={
+        DATABASES=databases or {
             "default": {
                 "ENGINE": "django.db.backends.sqlite3",
                 "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
-            }
+            },
+            # The tests read from it as a replica of default
+            "replica": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+                "TEST": {"MIRROR": "default"},
+            },
         },
         INSTALLED_APPS=(
             'django.contrib.admin',
@@ -76,5 +83,6 @@ def boot_django():
                 },
             },
         ],
+        **options,
     )
     django.setup()